@@ -0,0 +1,210 @@
+import time
+from typing import Tuple, Any, Optional, Callable, List
+
+import pygame
+from pygame.event import Event
+from pygame.time import Clock
+
+from latency import tracker
+from render_backend import present
+from tracing import tracer
+from ui import Component, HoverTracker, subtract_rects, run_after_update_callbacks
+
+# SDL reports wheel movement both as MOUSEWHEEL and as presses of these buttons
+LEGACY_WHEEL_BUTTONS = (4, 5)
+
+# Updates are run with a fixed timestep (update_interval, in milliseconds) decoupled from rendering, so that
+# components behave the same regardless of framerate. frame_budget limits how many milliseconds of wall-clock time
+# a single frame may spend catching up on updates; when it's exceeded the remaining backlog is dropped.
+class Application:
+  def __init__(self, screen, container: Component, background_color: Tuple[int, int, int] = (0, 0, 0),
+      background: Optional[Any] = None, target_fps: int = 60, update_interval: int = 10,
+      frame_budget: Optional[int] = None, idle_when_static: bool = True):
+    self._screen = screen
+    self._container = container
+    self._background_color = background_color
+    self._background = background
+    self._target_fps = target_fps
+    self._update_interval = update_interval
+    if frame_budget is None and target_fps > 0:
+      frame_budget = 1000 // target_fps
+    self._frame_budget = frame_budget
+    self._idle_when_static = idle_when_static
+    self._clock = Clock()
+    self._accumulated_time = 0
+    self._mouse_pos = pygame.mouse.get_pos()
+    self._hover_tracker = HoverTracker(container)
+    self._event_handlers: List[Callable[[Event], Any]] = []
+    self._before_frame_hooks: List[Callable[[], Any]] = []
+    self._after_frame_hooks: List[Callable[[int], Any]] = []
+    self._motion_path_listeners: List[Callable[[List[Tuple[int, int]]], Any]] = []
+
+  def add_event_handler(self, handler: Callable[[Event], Any]):
+    self._event_handlers.append(handler)
+
+  def add_before_frame_hook(self, hook: Callable[[], Any]):
+    self._before_frame_hooks.append(hook)
+
+  def add_after_frame_hook(self, hook: Callable[[int], Any]):
+    self._after_frame_hooks.append(hook)
+
+  # Mouse motion is coalesced to one event per frame. Listeners added here receive all the positions that the
+  # coalesced event passed through, for consumers such as drawing or dragging that care about the exact path.
+  def add_motion_path_listener(self, listener: Callable[[List[Tuple[int, int]]], Any]):
+    self._motion_path_listeners.append(listener)
+
+  def get_fps(self) -> float:
+    return self._clock.get_fps()
+
+  def run(self):
+    while True:
+      self.run_frame()
+
+  def run_frame(self):
+    for hook in self._before_frame_hooks:
+      hook()
+
+    with tracer.span("wait for events", "frame"):
+      events, has_slept = self._wait_for_events()
+    received_time = time.perf_counter()
+    with tracer.span("frame", "frame"):
+      self._process_frame(events, has_slept, received_time)
+
+  def _process_frame(self, events: List[Event], has_slept: bool, received_time: float):
+    events = coalesce_mouse_motion(events, keep_path=len(self._motion_path_listeners) > 0)
+    # When we have been sleeping in event.wait() the tick below returns immediately, as the frame cap has already
+    # been exceeded. When components are animating it limits us to the target framerate.
+    with tracer.span("frame cap", "frame"):
+      elapsed_time = self._clock.tick(self._target_fps)
+
+    if has_slept:
+      # Nothing was animating, so only timers are waiting for this time to pass and they handle large steps fine.
+      # The time passed before the input that woke us up, so it must not be applied to the effects of that input.
+      self._accumulated_time = 0
+      with tracer.span("update", "update"):
+        self._container.update(elapsed_time)
+      run_after_update_callbacks()
+      for event in events:
+        self._handle_event(event, received_time)
+    else:
+      for event in events:
+        self._handle_event(event, received_time)
+      self._run_fixed_updates(elapsed_time)
+      run_after_update_callbacks()
+
+    with tracer.span("render", "render"):
+      self._render_background()
+      self._container.render(self._screen)
+    with tracer.span("present", "render"):
+      present(self._screen)
+    tracker.frame_presented()
+
+    for hook in self._after_frame_hooks:
+      hook(elapsed_time)
+
+  # The screen is only cleared where no opaque component will be drawn over it
+  def _render_background(self):
+    occluders = []
+    self._container.collect_occluders(occluders)
+    for area in subtract_rects(self._screen.get_rect(), occluders):
+      self._screen.set_clip(area)
+      self._screen.fill(self._background_color)
+      if self._background:
+        self._background.render(self._screen)
+    self._screen.set_clip(None)
+
+  def _run_fixed_updates(self, elapsed_time: int):
+    self._accumulated_time += elapsed_time
+    start = time.perf_counter()
+    while self._accumulated_time >= self._update_interval:
+      with tracer.span("update", "update"):
+        self._container.update(self._update_interval)
+      self._accumulated_time -= self._update_interval
+      if self._frame_budget is not None and (time.perf_counter() - start) * 1000 > self._frame_budget:
+        # We can't keep up. Dropping the backlog slows the simulation down instead of stalling the rendering.
+        self._accumulated_time %= self._update_interval
+        break
+
+  def _wait_for_events(self) -> Tuple[List[Event], bool]:
+    if self._idle_when_static:
+      delay = self._container.time_until_update()
+      if delay is None:
+        # Nothing is animating and no timers are scheduled, so only user input can change what is on screen
+        return [pygame.event.wait()] + pygame.event.get(), True
+      if delay > 0:
+        event = pygame.event.wait(delay)
+        if event.type == pygame.NOEVENT:
+          return pygame.event.get(), True
+        return [event] + pygame.event.get(), True
+    return pygame.event.get(), False
+
+  def _handle_event(self, event: Event, received_time: float):
+    tracker.begin_event(event, received_time)
+    try:
+      with tracer.span(pygame.event.event_name(event.type), "input"):
+        self._dispatch_event(event)
+        # What the event caused is delivered now, so that its latency is measured
+        run_after_update_callbacks()
+    finally:
+      tracker.end_event()
+
+  def _dispatch_event(self, event: Event):
+    handle_exit(event)
+    if event.type == pygame.MOUSEBUTTONDOWN and event.button not in LEGACY_WHEEL_BUTTONS:
+      self._container.handle_mouse_was_clicked(event.pos)
+    elif event.type == pygame.MOUSEBUTTONUP and event.button not in LEGACY_WHEEL_BUTTONS:
+      self._container.handle_mouse_was_released()
+    elif event.type == pygame.MOUSEWHEEL:
+      self._container.handle_mouse_wheel(self._mouse_pos, event.y)
+      # Scrolling may have moved other components under the mouse
+      self._hover_tracker.handle_mouse_motion(self._mouse_pos)
+    elif event.type == pygame.MOUSEMOTION:
+      self._mouse_pos = event.pos
+      self._hover_tracker.handle_mouse_motion(event.pos)
+      if hasattr(event, 'path'):
+        for listener in self._motion_path_listeners:
+          listener(event.path)
+    elif event.type == pygame.KEYDOWN:
+      self._container.handle_key_was_pressed(event.key)
+    elif event.type == pygame.KEYUP:
+      self._container.handle_key_was_released(event.key)
+    for handler in self._event_handlers:
+      handler(event)
+
+
+def handle_exit(event: Event):
+  if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+    pygame.quit()
+    exit(0)
+
+
+# Replaces consecutive MOUSEMOTION events with a single one at the latest position. Motion is never moved across a
+# mouse button or wheel event, so that clicks, releases and scrolling still happen where the pointer was at the time.
+def coalesce_mouse_motion(events: List[Event], keep_path: bool = False) -> List[Event]:
+  result = []
+  pending_motion = []
+  for event in events:
+    if event.type == pygame.MOUSEMOTION:
+      pending_motion.append(event)
+      continue
+    if pending_motion and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL):
+      result.append(_merge_motion_events(pending_motion, keep_path))
+      pending_motion = []
+    result.append(event)
+  if pending_motion:
+    result.append(_merge_motion_events(pending_motion, keep_path))
+  return result
+
+
+def _merge_motion_events(events: List[Event], keep_path: bool) -> Event:
+  if len(events) == 1 and not keep_path:
+    return events[0]
+  last = events[-1]
+  attributes = {
+    'pos': last.pos,
+    'rel': (sum(e.rel[0] for e in events), sum(e.rel[1] for e in events)),
+    'buttons': last.buttons,
+  }
+  if keep_path:
+    attributes['path'] = [e.pos for e in events]
+  return Event(pygame.MOUSEMOTION, attributes)
@@ -5,7 +5,7 @@ from pygame.color import Color
 from pygame.math import Vector2
 
 from text import StaticText
-from ui import Component
+from ui import Component, call_after_updates
 from ui import Style
 
 COLOR_WHITE = Color(255, 255, 255)
@@ -20,12 +20,19 @@ class ButtonBehavior:
   def on_click(self) -> Optional[ButtonEvent]:
     return None
 
+  # Number of times the button fired, for the most recently returned FIRE event
+  def get_fire_count(self) -> int:
+    return 1
+
   def update(self, elapsed_time: int) -> Optional[ButtonEvent]:
     return None
 
   def on_release(self) -> Optional[ButtonEvent]:
     return None
 
+  def time_until_update(self) -> Optional[int]:
+    return None
+
 
 class HoldDownBehavior(ButtonBehavior):
   def __init__(self, initial_delay: int, repeat_interval: int):
@@ -33,22 +40,32 @@ class HoldDownBehavior(ButtonBehavior):
     self._repeat_interval = repeat_interval
     self._is_held_down = False
     self._fire_timer = 0
+    self._fire_count = 0
 
   def on_click(self) -> Optional[ButtonEvent]:
     self._is_held_down = True
     self._fire_timer = self._initial_delay
+    self._fire_count = 1
     return ButtonEvent.FIRE
 
+  def get_fire_count(self) -> int:
+    return self._fire_count
+
   def update(self, elapsed_time: int) -> Optional[ButtonEvent]:
-    should_fire = False
+    self._fire_count = 0
     if self._is_held_down:
       self._fire_timer -= elapsed_time
       while self._fire_timer <= 0:
         self._fire_timer += self._repeat_interval
-        should_fire = True
-    if should_fire:
+        self._fire_count += 1
+    if self._fire_count > 0:
       return ButtonEvent.FIRE
 
+  def time_until_update(self) -> Optional[int]:
+    if self._is_held_down:
+      return max(self._fire_timer, 0)
+    return None
+
   def on_release(self) -> Optional[ButtonEvent]:
     self._is_held_down = False
     return ButtonEvent.RELEASE
@@ -68,23 +85,36 @@ class SingleClickBehavior(ButtonBehavior):
       if self._cooldown == 0:
         return ButtonEvent.RELEASE
 
+  def time_until_update(self) -> Optional[int]:
+    return self._cooldown if self._cooldown > 0 else None
+
 
+# If a batch_callback is given, it's called once with the number of times that the button fired in a frame (a
+# held down button can fire repeatedly) instead of calling the callback that many times.
 class Button(Component):
   def __init__(self, size: Tuple[int, int], label: StaticText, behavior: ButtonBehavior,
       hotkey: Optional[int] = None, **kwargs):
     super().__init__(size, **kwargs)
     self._callback: Callable[[], Any] = kwargs.get('callback')
-    self._label = label
+    self._batch_callback: Callable[[int], Any] = kwargs.get('batch_callback')
+    self._label = self._adopt(label)
     self._style_on_click: Style = kwargs.get('style_onclick')
     self._hotkey = hotkey
     self._behavior = behavior
+    self._pending_fire_count = 0
 
   def update(self, elapsed_time: int):
     self._handle_event(self._behavior.update(elapsed_time))
 
+  def time_until_update(self) -> Optional[int]:
+    return self._behavior.time_until_update()
+
   def set_callback(self, callback: Callable[[], Any]):
     self._callback = callback
 
+  def set_batch_callback(self, batch_callback: Callable[[int], Any]):
+    self._batch_callback = batch_callback
+
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
     self._update_text_pos()
@@ -121,11 +151,22 @@ class Button(Component):
   def _handle_event(self, event: Optional[ButtonEvent]):
     if event == ButtonEvent.FIRE:
       self._active_style = self._style_on_click
-      if self._callback:
-        self._callback()
+      if self._batch_callback:
+        # Repeats from all the fixed timesteps of a frame are delivered together
+        if self._pending_fire_count == 0:
+          call_after_updates(self._deliver_fires)
+        self._pending_fire_count += self._behavior.get_fire_count()
+      elif self._callback:
+        for _ in range(self._behavior.get_fire_count()):
+          self._callback()
     elif event == ButtonEvent.RELEASE:
       self._active_style = self._style_hovered if self._is_hovered else self._style
 
+  def _deliver_fires(self):
+    fire_count = self._pending_fire_count
+    self._pending_fire_count = 0
+    self._batch_callback(fire_count)
+
 
 class ColorToggler(Button):
   def __init__(self, size: Tuple[int, int], label: StaticText, colors: List[Color], **kwargs):
@@ -139,10 +180,12 @@ class ColorToggler(Button):
     self._background = self._colors[self._index]
 
 
-def button(font, size: Tuple[int, int], callback: Callable[[], Any], label: str, hotkey: Optional[int] = None,
-    hold: Optional[HoldDownBehavior] = None):
+def button(font, size: Tuple[int, int], callback: Optional[Callable[[], Any]], label: str,
+    hotkey: Optional[int] = None, hold: Optional[HoldDownBehavior] = None,
+    batch_callback: Optional[Callable[[int], Any]] = None):
   return Button(size=size,
                 callback=callback,
+                batch_callback=batch_callback,
                 label=StaticText(font, COLOR_WHITE, label),
                 behavior=hold if hold else SingleClickBehavior(),
                 hotkey=hotkey,
@@ -1,10 +1,11 @@
+import math
 from typing import Tuple, Callable, Any, Optional
 
-import pygame
 from pygame.color import Color
 from pygame.math import Vector2
 from pygame.rect import Rect
 
+from render_backend import draw_rect, draw_line
 from text import StaticText
 from ui import Component
 from ui import Style
@@ -16,7 +17,7 @@ class Checkbox(Component):
   def __init__(self, size: Tuple[int, int], label: StaticText, checked: bool = False, **kwargs):
     super().__init__(size, **kwargs)
     self._callback: Callable[[bool], Any] = kwargs.get('callback')
-    self._label = label
+    self._label = self._adopt(label)
     self._style_on_click:Style = kwargs.get('style_onclick')
     self._cooldown = 0
     self._checked = checked
@@ -28,6 +29,9 @@ class Checkbox(Component):
       if self._cooldown == 0:
         self._active_style = self._style_hovered if self._is_hovered else self._style
 
+  def time_until_update(self) -> Optional[int]:
+    return self._cooldown if self._cooldown > 0 else None
+
   def set_callback(self, callback: Callable[[bool], Any]):
     self._callback = callback
 
@@ -37,19 +41,19 @@ class Checkbox(Component):
                        self._rect.centery - self._label.size[1] / 2)
     self._label.set_pos(text_pos)
     w = self._label._rect.h * 0.75
-    self._box = Rect(self._label._rect.right + 10, self._label._rect.bottom - w - 1, w, w)
+    self._box = Rect(self._label._rect.right + 10, math.floor(self._label._rect.bottom - w - 1), w, w)
 
   def _render_contents(self, surface):
     self._label.render(surface)
-    pygame.draw.rect(surface, Color(100, 100, 100), self._box)
-    pygame.draw.rect(surface, COLOR_WHITE, self._box, 1)
+    draw_rect(surface, Color(100, 100, 100), self._box)
+    draw_rect(surface, COLOR_WHITE, self._box, 1)
     if self._checked:
-      pygame.draw.line(surface, COLOR_WHITE, self._box.topleft, (self._box.right - 1, self._box.bottom - 1))
-      pygame.draw.line(surface, COLOR_WHITE, (self._box.left, self._box.bottom - 1),
-                       (self._box.right - 1, self._box.top))
+      draw_line(surface, COLOR_WHITE, self._box.topleft, (self._box.right - 1, self._box.bottom - 1))
+      draw_line(surface, COLOR_WHITE, (self._box.left, self._box.bottom - 1), (self._box.right - 1, self._box.top))
 
   def _on_click(self, mouse_pos: Optional[Tuple[int, int]]):
     self._checked = not self._checked
+    self._notify_changed()
     if self._callback:
       self._callback(self._checked)
     self._active_style = self._style_on_click
@@ -7,19 +7,110 @@ from pygame.math import Vector2
 from pygame.rect import Rect
 from pygame.surface import Surface
 
-from ui import Component
+from render_backend import draw_rect, draw_aalines, mark_changed
+from tracing import traced
+from ui import Component, subtract_rects, is_occlusion_culling_enabled
 
 
 class AbstractContainer(Component):
   def __init__(self, size: Tuple[int, int], children: List[Component], **kwargs):
     super().__init__(size, **kwargs)
-    self._children = children
-
+    self._children = list(children)
+    for child in self._children:
+      child._parent = self
+    self._layout_store = None
+    if kwargs.get('layout_store'):
+      # Imported here, because the layout store needs numpy
+      from layout_store import LayoutStore
+      self._layout_store = LayoutStore()
+
+  def add_child(self, child: Component):
+    self.insert_child(len(self._children), child)
+
+  # The children list is replaced rather than modified in place, so that a child's callback can change its siblings
+  # while the container is iterating over them
+  def insert_child(self, index: int, child: Component):
+    child._parent = self
+    self._children = self._children[:index] + [child] + self._children[index:]
+    self._relayout_children(index)
+
+  def remove_child(self, child: Component):
+    index = self._children.index(child)
+    child._parent = None
+    self._children = self._children[:index] + self._children[index + 1:]
+    self._relayout_children(index)
+
+  def replace_children(self, children: List[Component]):
+    for child in children:
+      child._parent = self
+    self._children = list(children)
+    self._relayout_children(0)
+
+  # Positions the children from the given index onwards, which are the only ones that can have moved when the
+  # children changed. The container itself keeps its size.
+  @traced("layout")
+  def _relayout_children(self, first_index: int):
+    if self._rect is not None:
+      self.set_pos(Vector2(self._rect.topleft))
+
+  # Children are clipped to the container, and children that are entirely outside of it or outside the area that is
+  # already clipped on the surface (such as the screen) aren't rendered at all
   def _render_contents(self, surface):
-    for component in self._children:
+    previous_clip = surface.get_clip()
+    clip = previous_clip.clip(self._rect)
+    if clip.width == 0 or clip.height == 0:
+      return
+    surface.set_clip(clip)
+    for component in self._children_to_render(clip):
       component.render(surface)
+    surface.set_clip(previous_clip)
+
+  def _children_to_render(self, clip: Rect) -> List[Component]:
+    if self._layout_store is not None:
+      return [self._children[i] for i in self._layout_store.indices_in_rect(clip)]
+    return [c for c in self._children if c._rect.colliderect(clip)]
+
+  # An opaque container hides everything behind it. Otherwise its opaque children do, as far as they are inside it.
+  def collect_occluders(self, occluders: List[Rect]):
+    if not is_occlusion_culling_enabled():
+      return
+    rect = self.get_opaque_rect()
+    if rect is not None:
+      occluders.append(rect)
+    elif self._is_visible:
+      occluders.extend(self._child_occluders(self._rect))
+
+  # The opaque areas of the children within the clip rect
+  def _child_occluders(self, clip: Rect) -> List[Rect]:
+    if not is_occlusion_culling_enabled():
+      return []
+    occluders = []
+    for component in self._children_to_render(clip):
+      component.collect_occluders(occluders)
+    return [o.clip(clip) for o in occluders if o.colliderect(clip)]
+
+  # Only the parts of the background that the children don't cover are drawn
+  def _render_background(self, surface):
+    if not self._active_style.background_color and not self._active_style.background_surface:
+      return
+    clip = surface.get_clip().clip(self._rect)
+    if clip.width == 0 or clip.height == 0:
+      return
+    for area in subtract_rects(clip, self._child_occluders(clip)):
+      self._render_background_area(surface, area)
+
+  def _child_changed(self, child: Component):
+    if self._layout_store is not None and child._rect is not None:
+      self._layout_store.update_component(self._children.index(child), child)
+    super()._child_changed(child)
 
   def _on_click(self, mouse_pos: Optional[Tuple[int, int]]):
+    if self._layout_store is not None:
+      # The children that use a layout store don't overlap, so only the one under the mouse can be clicked
+      index = self._layout_store.hit_test(mouse_pos)
+      if index is not None:
+        self._children[index].handle_mouse_was_clicked(mouse_pos)
+      return
     for component in self._children:
       component.handle_mouse_was_clicked(mouse_pos)
 
@@ -27,11 +118,38 @@ class AbstractContainer(Component):
     for component in self._children:
       component.update(elapsed_time)
 
+  def time_until_update(self) -> Optional[int]:
+    delays = [d for d in (c.time_until_update() for c in self._children) if d is not None]
+    return min(delays) if delays else None
+
   def handle_mouse_motion(self, mouse_pos: Tuple[int, int]):
     super().handle_mouse_motion(mouse_pos)
     for component in self._children:
       component.handle_mouse_motion(mouse_pos)
 
+  def handle_mouse_wheel(self, mouse_pos: Tuple[int, int], dy: int):
+    for component in self._children:
+      component.handle_mouse_wheel(mouse_pos, dy)
+
+  def find_hover_path(self, mouse_pos: Tuple[int, int], path: List[Tuple[Component, Tuple[int, int]]]):
+    num_components = len(path)
+    super().find_hover_path(mouse_pos, path)
+    if len(path) > num_components:
+      self._find_child_hover_path(mouse_pos, path)
+
+  # Children that are rendered later are on top, so they take precedence
+  def _find_child_hover_path(self, mouse_pos: Tuple[int, int], path: List[Tuple[Component, Tuple[int, int]]]):
+    if self._layout_store is not None:
+      index = self._layout_store.hit_test(mouse_pos)
+      if index is not None:
+        self._children[index].find_hover_path(mouse_pos, path)
+      return
+    num_components = len(path)
+    for component in reversed(self._children):
+      component.find_hover_path(mouse_pos, path)
+      if len(path) > num_components:
+        return
+
   def handle_key_was_pressed(self, key):
     for component in self._children:
       component.handle_key_was_pressed(key)
@@ -40,10 +158,6 @@ class AbstractContainer(Component):
     for component in self._children:
       component.handle_key_was_released(key)
 
-  def _on_blur(self):
-    for component in self._children:
-      component._on_blur()
-
   def handle_mouse_was_released(self):
     for component in self._children:
       component.handle_mouse_was_released()
@@ -55,11 +169,53 @@ class AbsolutePosContainer(AbstractContainer):
     super().__init__(size, [c[1] for c in positioned_children])
     self._positioned_children = positioned_children
 
+  @traced("layout")
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
     for relative_pos, component in self._positioned_children:
       component.set_pos(pos + relative_pos)
 
+  # Children that are added without a position are placed at the container's top left corner
+  def insert_child(self, index: int, child: Component):
+    self.insert_positioned_child(index, Vector2(0, 0), child)
+
+  def insert_positioned_child(self, index: int, relative_pos: Vector2, child: Component):
+    child._parent = self
+    self._positioned_children = self._positioned_children[:index] + [(relative_pos, child)] \
+                                + self._positioned_children[index:]
+    self._children = [c[1] for c in self._positioned_children]
+    # The other children don't depend on each other's positions
+    if self._rect is not None:
+      child.set_pos(Vector2(self._rect.topleft) + relative_pos)
+
+  def remove_child(self, child: Component):
+    child._parent = None
+    self._positioned_children = [c for c in self._positioned_children if c[1] is not child]
+    self._children = [c[1] for c in self._positioned_children]
+
+  def replace_children(self, children: List[Component]):
+    self.replace_positioned_children([(Vector2(0, 0), c) for c in children])
+
+  # Takes the children along with their positions, like the constructor
+  def replace_positioned_children(self, positioned_children: List[Tuple[Vector2, Component]]):
+    for _, child in positioned_children:
+      child._parent = self
+    self._positioned_children = list(positioned_children)
+    self._children = [c[1] for c in self._positioned_children]
+    self._relayout_children(0)
+
+  # Children can overlap, and the ones that are entirely covered by opaque children on top of them are skipped
+  def _children_to_render(self, clip: Rect) -> List[Component]:
+    children = []
+    occluders = []
+    for component in reversed(super()._children_to_render(clip)):
+      visible_rect = component._rect.clip(clip)
+      if not any(o.contains(visible_rect) for o in occluders):
+        children.append(component)
+      component.collect_occluders(occluders)
+    children.reverse()
+    return children
+
 
 class Orientation(Enum):
   HORIZONTAL = 1
@@ -93,37 +249,65 @@ class ListContainer(AbstractContainer):
     self._orientation = orientation
 
     for child in children:
-      if child.size[0] == 'fill_parent':
-        if self._orientation == Orientation.VERTICAL:
-          child.size = (self.size[0] - self._padding * 2, child.size[1])
-        else:
-          raise Exception("Cannot fill child's width inside a horizontal list!")
-      if child.size[1] == 'fill_parent':
-        if self._orientation == Orientation.HORIZONTAL:
-          child.size = (child.size[0], self.size[1] - self._padding * 2)
-        else:
-          raise Exception("Cannot fill child's height inside a vertical list!")
+      self._fill_parent(child)
     print("Children: %s" % [(c, c.size) for c in self._children])
 
-    if margin == 'auto':
-      if len(self._children) < 2:
-        self._margin = 0
-      elif orientation == Orientation.HORIZONTAL:
-        width_sum = sum([component.size[0] for component in self._children])
-        self._margin = (self.size[0] - width_sum - self._padding * 2) / (len(self._children) - 1)
+    self._is_auto_margin = margin == 'auto'
+    if self._is_auto_margin:
+      self._update_auto_margin()
+
+  def _fill_parent(self, child: Component):
+    if child.size[0] == 'fill_parent':
+      if self._orientation == Orientation.VERTICAL:
+        child.size = (self.size[0] - self._padding * 2, child.size[1])
+      else:
+        raise Exception("Cannot fill child's width inside a horizontal list!")
+    if child.size[1] == 'fill_parent':
+      if self._orientation == Orientation.HORIZONTAL:
+        child.size = (child.size[0], self.size[1] - self._padding * 2)
       else:
-        height_sum = sum([component.size[1] for component in self._children])
-        self._margin = (self.size[1] - height_sum - self._padding * 2) / (len(self._children) - 1)
+        raise Exception("Cannot fill child's height inside a vertical list!")
 
+  def _update_auto_margin(self):
+    if len(self._children) < 2:
+      self._margin = 0
+    elif self._orientation == Orientation.HORIZONTAL:
+      width_sum = sum([component.size[0] for component in self._children])
+      self._margin = (self.size[0] - width_sum - self._padding * 2) / (len(self._children) - 1)
+    else:
+      height_sum = sum([component.size[1] for component in self._children])
+      self._margin = (self.size[1] - height_sum - self._padding * 2) / (len(self._children) - 1)
+
+  @traced("layout")
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
-    relative_pos = Vector2(self._padding, self._padding)
-    for component in self._children:
-      component.set_pos(pos + relative_pos)
-      if self._orientation == Orientation.HORIZONTAL:
-        relative_pos += (component.size[0] + self._margin, 0)
+    self._layout_children(0)
+
+  @traced("layout")
+  def _relayout_children(self, first_index: int):
+    for child in self._children[first_index:]:
+      self._fill_parent(child)
+    if self._is_auto_margin:
+      # The spacing between all the children changes
+      self._update_auto_margin()
+      first_index = 0
+    if self._rect is not None:
+      self._layout_children(first_index)
+
+  def _layout_children(self, first_index: int):
+    if self._layout_store is not None:
+      self._layout_store.layout_list(self._children, Vector2(self._rect.topleft), self._padding, self._margin,
+                                     self._orientation == Orientation.HORIZONTAL, first_index)
+      return
+    axis = 0 if self._orientation == Orientation.HORIZONTAL else 1
+    offset = self._padding + sum(c.size[axis] + self._margin for c in self._children[:first_index])
+    pos = Vector2(self._rect.topleft)
+    for component in self._children[first_index:]:
+      if axis == 0:
+        component.set_pos(pos + (offset, self._padding))
       else:
-        relative_pos += (0, component.size[1] + self._margin)
+        component.set_pos(pos + (self._padding, offset))
+      offset += component.size[axis] + self._margin
 
 
 class EvenSpacingContainer(AbstractContainer):
@@ -135,9 +319,12 @@ class EvenSpacingContainer(AbstractContainer):
     super().__init__((width, container_height), children, **kwargs)
     self._padding = padding
 
+  @traced("layout")
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
     width_sum = sum([component.size[0] for component in self._children])
+    if len(self._children) == 0:
+      return
     if len(self._children) < 2:
       component = self._children[0]
       component.set_pos(Vector2(self._rect.centerx - component.size[0] // 2, pos[1] + self._padding))
@@ -150,10 +337,17 @@ class EvenSpacingContainer(AbstractContainer):
 
 
 # NOTE: Scroll container sets "local" positions for its children, in contrast to other containers
-# The children are rendered on a separate surface and then blitted / clipped onto the screen
+# The children are rendered on a separate surface and then blitted / clipped onto the screen. That surface is kept
+# between frames: scrolling shifts its pixels and only renders the strip that was exposed, while anything that could
+# change how the children look (input, running timers) causes a full repaint. Children that are changed from elsewhere,
+# such as another component's callback, report it and only they are repainted.
 class ScrollContainer(AbstractContainer):
   SCROLLBAR_WIDTH = 15
   SCROLLBAR_MARGIN = 5
+  # Pixels per second when holding down the scrollbar
+  SCROLL_SPEED = 300
+  # Pixels per mouse wheel step
+  WHEEL_SCROLL_AMOUNT = 20
 
   def __init__(self, height: Any, children: List[Component], padding: int, margin: int, **kwargs):
     container_width = max(c.size[0] for c in children) \
@@ -162,39 +356,118 @@ class ScrollContainer(AbstractContainer):
                       + ScrollContainer.SCROLLBAR_MARGIN
     size = (container_width, height)
     super().__init__(size, children, **kwargs)
-    sum_height = sum(c.size[1] for c in children) + padding * 2 + margin * (len(children) - 1)
-    self._max_scroll = sum_height - height
     self._padding = padding
     self._margin = margin
+    self._max_scroll = max(self._content_height() - height, 0)
     self._scroll_y = 0
     self._scrollbar = None
     self._scrollbar_top = None
     self._scrollbar_bottom = None
     self._scrolling_velocity = 0
+    self._scroll_remainder = 0.0
+    self._buffer: Optional[Surface] = None
+    self._buffer_scroll_y = 0
+    self._is_buffer_dirty = True
+    # Everything below this y coordinate in the scrolled contents must be repainted
+    self._dirty_contents_top: Optional[int] = None
+    # The area of the buffer that holds children which have changed since it was painted
+    self._changed_area: Optional[Rect] = None
+    self._hovered_child: Optional[Component] = None
+
+  def _content_height(self) -> int:
+    return sum(c.size[1] for c in self._children) + self._padding * 2 + self._margin * (len(self._children) - 1)
+
+  # Children below the changed ones move, while the ones above stay where they are and keep their pixels in the buffer
+  @traced("layout")
+  def _relayout_children(self, first_index: int):
+    self._max_scroll = max(self._content_height() - self.size[1], 0)
+    if self._hovered_child not in self._children:
+      self._hovered_child = None
+    if self._scroll_y > self._max_scroll:
+      self._scroll_y = self._max_scroll
+      self._update_children()
+      self._is_buffer_dirty = True
+      return
+    self._update_children(first_index)
+    top = self._padding + sum(c.size[1] + self._margin for c in self._children[:first_index])
+    if self._dirty_contents_top is None or top < self._dirty_contents_top:
+      self._dirty_contents_top = top
 
   def scroll(self, dy: int):
-    self._scroll_y = max(0, min(self._scroll_y + dy, self._max_scroll))
-    self._update_children()
+    scroll_y = max(0, min(self._scroll_y + dy, self._max_scroll))
+    if scroll_y != self._scroll_y:
+      self._scroll_y = scroll_y
+      self._update_children()
 
   def _render_contents(self, surface):
-    s = Surface(self.size, pygame.SRCALPHA)
-    for component in self._children:
-      component.render(s)
-    surface.blit(s, self._rect.topleft)
-    pygame.draw.rect(surface, Color(150, 150, 150), self._scrollbar)
+    if self._buffer is None:
+      self._buffer = Surface(self.size, pygame.SRCALPHA)
+      self._is_buffer_dirty = True
+    delta = self._scroll_y - self._buffer_scroll_y
+    if self._is_buffer_dirty or abs(delta) >= self._rect.h:
+      self._repaint_buffer(self._buffer.get_rect())
+    elif delta != 0:
+      self._buffer.scroll(0, -delta)
+      if delta > 0:
+        self._repaint_buffer(Rect(0, self._rect.h - delta, self._rect.w, delta))
+      else:
+        self._repaint_buffer(Rect(0, 0, self._rect.w, -delta))
+    if self._dirty_contents_top is not None and not self._is_buffer_dirty:
+      top = max(self._dirty_contents_top - self._scroll_y, 0)
+      if top < self._rect.h:
+        self._repaint_buffer(Rect(0, top, self._rect.w, self._rect.h - top))
+    if self._changed_area is not None and not self._is_buffer_dirty:
+      self._repaint_buffer(self._changed_area)
+    self._dirty_contents_top = None
+    self._changed_area = None
+    self._is_buffer_dirty = False
+    self._buffer_scroll_y = self._scroll_y
+
+    surface.blit(self._buffer, self._rect.topleft)
+    draw_rect(surface, Color(150, 150, 150), self._scrollbar)
     height = 10
     up_arrow = [(self._scrollbar.centerx, self._scrollbar.top + 2),
                 (self._scrollbar.left + 1, self._scrollbar.top + 2 + height),
                 (self._scrollbar.right - 2, self._scrollbar.top + 2 + height)]
-    pygame.draw.aalines(surface, Color(255, 255, 255), True, up_arrow)
+    draw_aalines(surface, Color(255, 255, 255), True, up_arrow)
     down_arrow = [(self._scrollbar.centerx, self._scrollbar.bottom - 2),
                   (self._scrollbar.left + 1, self._scrollbar.bottom - 2 - height),
                   (self._scrollbar.right - 2, self._scrollbar.bottom - 2 - height)]
-    pygame.draw.aalines(surface, Color(255, 255, 255), True, down_arrow)
+    draw_aalines(surface, Color(255, 255, 255), True, down_arrow)
+
+  # Children look different when a clip rect cuts through them (borders are drawn along the clip's edge), so the
+  # children in the area are repainted whole. This also replaces what was drawn along the buffer's edge before
+  # scrolling moved it inwards.
+  def _repaint_buffer(self, area: Rect):
+    children = [c for c in self._children if c._rect.colliderect(area)]
+    area = area.unionall([c._rect for c in children]).clip(self._buffer.get_rect())
+    self._buffer.set_clip(area)
+    self._buffer.fill((0, 0, 0, 0), area)
+    for component in children:
+      component.render(self._buffer)
+    self._buffer.set_clip(None)
+    mark_changed(self._buffer)
+
+  # The children are positioned in the buffer's coordinates
+  def _child_changed(self, child: Component):
+    if child._rect is None:
+      self._is_buffer_dirty = True
+    elif self._changed_area is None:
+      self._changed_area = Rect(child._rect)
+    else:
+      self._changed_area.union_ip(child._rect)
+    super()._child_changed(child)
 
+  # The children are positioned locally. The buffer is repainted before it's shown if any of them have changed.
+  def _child_occluders(self, clip: Rect) -> List[Rect]:
+    local_clip = clip.move(-self._rect.x, -self._rect.y)
+    return [o.move(self._rect.topleft) for o in super()._child_occluders(local_clip)]
+
+  @traced("layout")
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
     self._update_children()
+    self._is_buffer_dirty = True
     self._scrollbar = Rect(
         self._rect.right - ScrollContainer.SCROLLBAR_WIDTH - ScrollContainer.SCROLLBAR_MARGIN,
         self._rect.top + ScrollContainer.SCROLLBAR_MARGIN,
@@ -205,36 +478,86 @@ class ScrollContainer(AbstractContainer):
                                   self._scrollbar.h // 2)
 
   def handle_mouse_motion(self, mouse_pos: Tuple[int, int]):
-    super().handle_mouse_motion(mouse_pos)
+    was_hovered = self._is_hovered
+    # The children are positioned locally, so they must not be given the global mouse position
+    Component.handle_mouse_motion(self, mouse_pos)
+    if not was_hovered and not self._is_hovered:
+      return
+    self._is_buffer_dirty = True
     local_mouse_pos = (mouse_pos[0] - self._rect.x, mouse_pos[1] - self._rect.y)
     for component in self._children:
       component.handle_mouse_motion(local_mouse_pos)
 
+  def _find_child_hover_path(self, mouse_pos: Tuple[int, int], path: List[Tuple[Component, Tuple[int, int]]]):
+    num_components = len(path)
+    local_mouse_pos = (mouse_pos[0] - self._rect.x, mouse_pos[1] - self._rect.y)
+    super()._find_child_hover_path(local_mouse_pos, path)
+    hovered_child = path[num_components][0] if len(path) > num_components else None
+    if hovered_child is not self._hovered_child:
+      self._hovered_child = hovered_child
+      self._is_buffer_dirty = True
+
+  def _on_blur(self):
+    self._hovered_child = None
+    self._is_buffer_dirty = True
+
+  def handle_mouse_wheel(self, mouse_pos: Tuple[int, int], dy: int):
+    if self._is_visible and self._rect.collidepoint(mouse_pos[0], mouse_pos[1]):
+      self.scroll(-dy * ScrollContainer.WHEEL_SCROLL_AMOUNT)
+      local_mouse_pos = (mouse_pos[0] - self._rect.x, mouse_pos[1] - self._rect.y)
+      for component in self._children:
+        component.handle_mouse_wheel(local_mouse_pos, dy)
+
   def _on_click(self, mouse_pos: Optional[Tuple[int, int]]):
+    self._is_buffer_dirty = True
     local_mouse_pos = (mouse_pos[0] - self._rect.x, mouse_pos[1] - self._rect.y)
-    scroll_amount = 3
     if self._scrollbar_top.collidepoint(mouse_pos):
-      self._scrolling_velocity = -scroll_amount
+      self._scrolling_velocity = -ScrollContainer.SCROLL_SPEED
     if self._scrollbar_bottom.collidepoint(mouse_pos):
-      self._scrolling_velocity = scroll_amount
+      self._scrolling_velocity = ScrollContainer.SCROLL_SPEED
     for component in self._children:
       component.handle_mouse_was_clicked(local_mouse_pos)
 
   def handle_mouse_was_released(self):
     super().handle_mouse_was_released()
+    self._is_buffer_dirty = True
     self._scrolling_velocity = 0
+    self._scroll_remainder = 0.0
 
-  def _update_children(self):
-    pos = Vector2(self._padding, self._padding - self._scroll_y)
-    for component in self._children:
+  def handle_key_was_pressed(self, key):
+    super().handle_key_was_pressed(key)
+    self._is_buffer_dirty = True
+
+  def handle_key_was_released(self, key):
+    super().handle_key_was_released(key)
+    self._is_buffer_dirty = True
+
+  def _update_children(self, first_index: int = 0):
+    offset = sum(c.size[1] + self._margin for c in self._children[:first_index])
+    pos = Vector2(self._padding, self._padding - self._scroll_y + offset)
+    for component in self._children[first_index:]:
       component.set_pos(pos)
       pos += (0, component.size[1] + self._margin)
 
   def update(self, elapsed_time: int):
+    # Children with running timers may change their appearance during the update
+    if super().time_until_update() is not None:
+      self._is_buffer_dirty = True
     super().update(elapsed_time)
-    self.scroll(self._scrolling_velocity)
+    if self._scrolling_velocity != 0:
+      self._scroll_remainder += self._scrolling_velocity * elapsed_time / 1000
+      dy = int(self._scroll_remainder)
+      self._scroll_remainder -= dy
+      self.scroll(dy)
 
+  def time_until_update(self) -> Optional[int]:
+    if self._scrolling_velocity != 0:
+      return 0
+    return super().time_until_update()
 
+
+# The cell size is the size of the largest child that the grid is created with. Like other containers the grid keeps
+# its size, so children that are added later must fit in the cells and in the grid's dimensions.
 class GridContainer(AbstractContainer):
   def __init__(self, children: List[Component], dimensions: Tuple[int, int], padding: int, margin: int, **kwargs):
     self._cell_size = (max(c.size[0] for c in children), max(c.size[1] for c in children))
@@ -244,14 +567,40 @@ class GridContainer(AbstractContainer):
     self._dimensions = dimensions
     self._padding = padding
     self._margin = margin
+    self._check_children(self._children)
+
+  def insert_child(self, index: int, child: Component):
+    self._check_children(self._children + [child])
+    super().insert_child(index, child)
+
+  def replace_children(self, children: List[Component]):
+    self._check_children(children)
+    super().replace_children(children)
 
+  def _check_children(self, children: List[Component]):
+    num_cells = self._dimensions[0] * self._dimensions[1]
+    if len(children) > num_cells:
+      raise Exception("Cannot fit %i children in a grid with %i cells!" % (len(children), num_cells))
+    for child in children:
+      if child.size[0] > self._cell_size[0] or child.size[1] > self._cell_size[1]:
+        raise Exception("Child of size %s doesn't fit in grid cells of size %s!" % (child.size, self._cell_size))
+
+  @traced("layout")
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
-    relative_pos = (self._padding, self._padding)
+    self._relayout_children(0)
+
+  # The cells are fixed, so each child's position only depends on its index
+  @traced("layout")
+  def _relayout_children(self, first_index: int):
+    if self._rect is None:
+      return
     num_cols = self._dimensions[0]
-    for i, component in enumerate(self._children):
-      component.set_pos(pos + relative_pos)
-      if i % num_cols == num_cols - 1:
-        relative_pos = (self._padding, relative_pos[1] + self._cell_size[1] + self._margin)
-      else:
-        relative_pos = (relative_pos[0] + self._cell_size[0] + self._margin, relative_pos[1])
+    if self._layout_store is not None:
+      self._layout_store.layout_grid(self._children, Vector2(self._rect.topleft), self._padding, self._margin,
+                                     self._cell_size, num_cols, first_index)
+      return
+    for i in range(first_index, len(self._children)):
+      (row, col) = divmod(i, num_cols)
+      self._children[i].set_pos(Vector2(self._rect.x + self._padding + col * (self._cell_size[0] + self._margin),
+                                        self._rect.y + self._padding + row * (self._cell_size[1] + self._margin)))
@@ -9,7 +9,7 @@ from ui import Component
 class Counter(Component):
   def __init__(self, size: Tuple[int, int], formatted_text: FormattedText, **kwargs):
     super().__init__(size, **kwargs)
-    self._text = formatted_text
+    self._text = self._adopt(formatted_text)
     self._count = 0
     self._update_text()
 
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
+# Imported first, so that the startup timeline includes the time spent importing everything else
+from startup import timeline, init_subsystems, ensure_mixer
+
 import os
+import wave
 from typing import Tuple, Callable, Any, Optional
 
 import pygame
 from pygame.color import Color
-from pygame.font import Font
 from pygame.math import Vector2
 from pygame.rect import Rect
-from pygame.time import Clock
 
+from app import Application
 from button import HoldDownBehavior, Button, SingleClickBehavior
 from containers import GridContainer, EvenSpacingContainer, AbsolutePosContainer
-from images import Surface
+from fonts import get_font
+from images import Surface, ProgressiveImageLoader
+from render_backend import draw_rect
 from text import StaticText, TextArea
 from ui import Style, Component
 
@@ -31,57 +36,47 @@ PADDING = 32
 class FileBrowser:
 
   def __init__(self):
-    pygame.init()
+    timeline.mark("import")
+    # The mixer is initialized when the first sound is played
+    init_subsystems()
     screen = pygame.display.set_mode(SCREEN_RESOLUTION)
     pygame.display.set_caption("FILE BROWSER")
-    clock = Clock()
+    timeline.mark("init")
 
-    font = Font('resources/consola.ttf', 14)
-    font_small = Font('resources/consola.ttf', 14)
+    font = get_font('resources/consola.ttf', 14)
+    timeline.mark("fonts")
     background_color = (0, 0, 0)
 
     grid_dimensions = (3, 10)
-    self.buttons = [blank_button(font) for _ in range(grid_dimensions[0] * grid_dimensions[1])]
+    self.font = font
+    self.num_cells = grid_dimensions[0] * grid_dimensions[1]
+    self.parent_dir_button = button(font, BUTTON_SIZE, callback=lambda: self.change_dir(".."), label="..",
+                                    background_color=COLOR_FILE)
 
-    grid = GridContainer(children=self.buttons, dimensions=grid_dimensions, padding=5, margin=1,
-                         style=Style(background_color=KEYBOARD_BACKGROUND_COLOR, border_color=LIGHT_GRAY))
+    self.grid = GridContainer(children=[self.parent_dir_button], dimensions=grid_dimensions, padding=5, margin=1,
+                              style=Style(background_color=KEYBOARD_BACKGROUND_COLOR, border_color=LIGHT_GRAY))
     width = SCREEN_RESOLUTION[0] - PADDING * 2
-    grid_container = EvenSpacingContainer(width, "fit_contents", [grid], padding=0)
+    # The grid is wider than the padded area, so it's centered across the whole screen
+    grid_container = EvenSpacingContainer(SCREEN_RESOLUTION[0], "fit_contents", [self.grid], padding=0)
 
     dir_path = os.path.dirname(os.path.realpath(__file__))
     self.text_current_dir = StaticText(font, WHITE, dir_path,
                                        style=Style(background_color=Color(50, 50, 50)))
     self.file_names = os.listdir(".")
-    self.preview = FilePreview((width, 230), font_small)
+    self.preview = FilePreview((width, 230), font)
 
     container = AbsolutePosContainer(SCREEN_RESOLUTION,
                                      [(Vector2(PADDING, PADDING), self.text_current_dir),
                                       (Vector2(PADDING, 80), self.preview),
-                                      (Vector2(PADDING, 330), grid_container)])
+                                      (Vector2(0, 330), grid_container)])
     container.set_pos(Vector2(0, 0))
 
     self.setup_keys()
+    timeline.mark("tree")
 
-    while True:
-      for event in pygame.event.get():
-        handle_exit(event)
-        if event.type == pygame.MOUSEBUTTONDOWN:
-          container.handle_mouse_was_clicked(pygame.mouse.get_pos())
-        elif event.type == pygame.MOUSEBUTTONUP:
-          container.handle_mouse_was_released()
-        elif event.type == pygame.MOUSEMOTION:
-          container.handle_mouse_motion(pygame.mouse.get_pos())
-        elif event.type == pygame.KEYDOWN:
-          container.handle_key_was_pressed(event.key)
-        elif event.type == pygame.KEYUP:
-          container.handle_key_was_released(event.key)
-      elapsed_time = clock.tick()
-
-      container.update(elapsed_time)
-
-      screen.fill(background_color)
-      container.render(screen)
-      pygame.display.flip()
+    app = Application(screen, container, background_color)
+    timeline.report_after_first_frame(app)
+    app.run()
 
   def change_dir(self, directory: str):
     os.chdir(directory)
@@ -99,42 +94,51 @@ class FileBrowser:
             text = f.read()
             self.preview.show_text("Text file: %s\n\n%s" % (filename, text))
         except UnicodeDecodeError:
-          try:
-            image = pygame.image.load(filename)
-            self.preview.show_image(image)
-          except pygame.error:
-            try:
-              self.preview.play_sound(filename)
-            except pygame.error:
-              self.preview.show_text("Unknown file: %s\n\ncontents not shown" % filename)
+          self.preview.show_image_file(filename, on_error=lambda: self.show_non_image_file(filename))
 
     return callback
 
+  def show_non_image_file(self, filename: str):
+    try:
+      self.preview.play_sound(filename)
+    except pygame.error:
+      self.preview.show_text("Unknown file: %s\n\ncontents not shown" % filename)
+
+  # The first cell is taken by the ".." button, and files that don't fit in the grid aren't shown
   def setup_keys(self):
-    self.buttons[0].set_label("..")
-    self.buttons[0].set_callback(lambda: self.change_dir(".."))
-    for i, btn in enumerate(self.buttons[1:]):
-      if i < len(self.file_names):
-        filename = self.file_names[i]
-        btn.set_label(filename)
-        btn.set_callback(self.create_file_callback(filename))
-        btn.set_label_color(Color(150, 150, 255) if os.path.isdir(filename) else WHITE)
-      else:
-        btn.set_label("")
-        btn.set_callback(lambda: None)
+    file_buttons = [file_button(self.font, filename, self.create_file_callback(filename))
+                    for filename in self.file_names[:self.num_cells - 1]]
+    self.grid.replace_children([self.parent_dir_button] + file_buttons)
 
 
 class FilePreview(Component):
   def __init__(self, size: Tuple[int, int], font):
     super().__init__(size)
-    self._text_component = TextArea(font, WHITE, size, padding=16,
-                                    style=Style(border_color=LIGHT_GRAY))
-    self._image_component = Surface(None, style=Style(border_color=LIGHT_GRAY))
-    self._seekbar = Seekbar((size[0] - 8, 16))
+    self._text_component = self._adopt(TextArea(font, WHITE, size, padding=16, async_layout=True,
+                                                style=Style(border_color=LIGHT_GRAY)))
+    self._image_component = self._adopt(Surface(None, style=Style(border_color=LIGHT_GRAY)))
+    self._image_loader = ProgressiveImageLoader()
+    self._on_image_error: Optional[Callable[[], Any]] = None
+    self._seekbar = self._adopt(Seekbar((size[0] - 8, 16)))
     self._seekbar.set_visible(False)
 
   def update(self, elapsed_time: int):
-    self._seekbar.update(elapsed_time)
+    self._text_component.update(elapsed_time)
+    if self._image_loader.is_pending():
+      result = self._image_loader.poll()
+      if isinstance(result, Exception):
+        self._on_image_error()
+      elif result is not None:
+        self.show_image(result)
+    if self._seekbar.is_visible():
+      # get_pos() is -1 once the music has stopped
+      position = pygame.mixer.music.get_pos()
+      self._seekbar.set_position(position if position >= 0 else self._seekbar.get_duration())
+
+  def time_until_update(self) -> Optional[int]:
+    if self._seekbar.is_visible() and pygame.mixer.music.get_busy() or self._image_loader.is_pending():
+      return 0
+    return self._text_component.time_until_update()
 
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
@@ -143,14 +147,20 @@ class FilePreview(Component):
     self._seekbar.set_pos(Vector2(self._rect.x + 4, self._rect.bottom - 20))
 
   def show_text(self, text: str):
+    self._image_loader.cancel()
     self._text_component.set_text(text)
     self._text_component.set_visible(True)
     self._image_component.set_visible(False)
     self._seekbar.set_visible(False)
 
+  # Decodes and scales the image in the background. If it can't be loaded as an image, on_error is called.
+  def show_image_file(self, filename: str, on_error: Callable[[], Any]):
+    self._on_image_error = on_error
+    self._image_loader.load(filename, self._rect.size)
+
   def show_image(self, image):
     scaled_size = image.get_rect().fit(self._rect).size
-    scaled_image = pygame.transform.scale(image, scaled_size)
+    scaled_image = image if image.get_size() == scaled_size else pygame.transform.scale(image, scaled_size)
     self._image_component.set_pos(Vector2(self._rect.centerx - scaled_size[0] // 2, self._rect.y))
 
     self._image_component.set_surface(scaled_image)
@@ -158,16 +168,23 @@ class FilePreview(Component):
     self._image_component.set_visible(True)
     self._seekbar.set_visible(False)
 
+  # The music module streams the file from disk while it's playing, rather than decoding all of it up front
   def play_sound(self, filename: str):
-    sound = pygame.mixer.Sound(filename)
-    duration = sound.get_length()
-    text = "Sound file: %s\n\nDuration: %.3f seconds" % (filename, duration)
+    self._image_loader.cancel()
+    ensure_mixer()
+    pygame.mixer.music.load(filename)
+    duration = read_audio_duration(filename)
+    if duration is not None:
+      text = "Sound file: %s\n\nDuration: %.3f seconds" % (filename, duration)
+    else:
+      text = "Sound file: %s\n\nDuration: unknown" % filename
     self._text_component.set_text(text)
     self._text_component.set_visible(True)
     self._image_component.set_visible(False)
-    self._seekbar.set_visible(True)
-    self._seekbar.start(int(duration * 1000))
-    sound.play()
+    self._seekbar.set_visible(duration is not None)
+    if duration is not None:
+      self._seekbar.set_duration(int(duration * 1000))
+    pygame.mixer.music.play()
 
   def _render_contents(self, surface):
     self._text_component.render(surface)
@@ -180,16 +197,20 @@ class Seekbar(Component):
     super().__init__(size)
     self._inner_rect = None
     self._total_millis = 1
-    self._remaining_millis = 0
+    self._position_millis = 0
     self._padding = 2
 
-  def start(self, total_millis: int):
-    self._total_millis = total_millis
-    self._remaining_millis = total_millis
+  def set_duration(self, total_millis: int):
+    self._total_millis = max(total_millis, 1)
+    self.set_position(0)
 
-  def update(self, elapsed_time: int):
-    self._remaining_millis = max(self._remaining_millis - elapsed_time, 0)
+  def get_duration(self) -> int:
+    return self._total_millis
+
+  def set_position(self, position_millis: int):
+    self._position_millis = min(position_millis, self._total_millis)
     self._update_inner_rect()
+    self._notify_changed()
 
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
@@ -198,18 +219,21 @@ class Seekbar(Component):
   def _update_inner_rect(self):
     self._inner_rect = Rect(self._rect.x + self._padding,
                             self._rect.y + self._padding,
-                            (self._rect.w - self._padding * 2) * (1 - self._remaining_millis / self._total_millis),
+                            (self._rect.w - self._padding * 2) * self._position_millis / self._total_millis,
                             self._rect.h - self._padding * 2)
 
   def _render_contents(self, surface):
-    pygame.draw.rect(surface, Color(50, 50, 50), self._rect)
-    pygame.draw.rect(surface, Color(200, 255, 255), self._inner_rect)
+    draw_rect(surface, Color(50, 50, 50), self._rect)
+    draw_rect(surface, Color(200, 255, 255), self._inner_rect)
 
 
-def handle_exit(event):
-  if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-    pygame.quit()
-    exit(0)
+# Reads the duration from the file's headers, for the formats where that's possible without decoding the audio
+def read_audio_duration(filename: str) -> Optional[float]:
+  try:
+    with wave.open(filename, "rb") as f:
+      return f.getnframes() / f.getframerate()
+  except (wave.Error, EOFError):
+    return None
 
 
 def button(font, size: Tuple[int, int], callback: Callable[[], Any], label: str, background_color: Color,
@@ -231,8 +255,10 @@ def dir_button(font):
   return button(font, BUTTON_SIZE, callback=lambda: None, label="", background_color=Color(255, 255, 0))
 
 
-def blank_button(font):
-  return button(font, BUTTON_SIZE, callback=lambda: None, label="", background_color=COLOR_FILE)
+def file_button(font, filename: str, callback: Callable[[], Any]):
+  btn = button(font, BUTTON_SIZE, callback=callback, label=filename, background_color=COLOR_FILE)
+  btn.set_label_color(Color(150, 150, 255) if os.path.isdir(filename) else WHITE)
+  return btn
 
 
 if __name__ == '__main__':
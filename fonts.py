@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple, Iterable, Optional, List
+
+import pygame
+from pygame.font import Font
+
+FontKey = Tuple[str, int, bool, bool]
+
+
+# Hands out one shared Font per (path, size, bold, italic). Fonts are parsed when they are first asked for, or ahead
+# of time on a worker thread with warm(). Sharing the Font objects also means sharing their glyph caches, and the
+# glyph atlases that are built per font.
+class FontRegistry:
+  def __init__(self):
+    self._lock = threading.Lock()
+    # A font that is being loaded is represented by an unfinished future, so that a second request waits for the
+    # first load instead of parsing the file again
+    self._fonts: Dict[FontKey, Future] = {}
+    self._executor: Optional[ThreadPoolExecutor] = None
+
+  def get_font(self, path: str, size: int, bold: bool = False, italic: bool = False) -> Font:
+    return self._get_future((path, size, bold, italic), load_now=True).result()
+
+  # Starts loading the given (path, size) or (path, size, bold, italic) fonts in the background
+  def warm(self, fonts: Iterable[Tuple]) -> List[Future]:
+    if not pygame.font.get_init():
+      pygame.font.init()
+    if self._executor is None:
+      self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="font-loader")
+    return [self._get_future(_font_key(*font), load_now=False) for font in fonts]
+
+  def _get_future(self, key: FontKey, load_now: bool) -> Future:
+    with self._lock:
+      future = self._fonts.get(key)
+      if future is not None:
+        return future
+      future = Future()
+      self._fonts[key] = future
+    if load_now:
+      _load_into(future, key)
+    else:
+      self._executor.submit(_load_into, future, key)
+    return future
+
+
+def _font_key(path: str, size: int, bold: bool = False, italic: bool = False) -> FontKey:
+  return path, size, bold, italic
+
+
+def _load_into(future: Future, key: FontKey):
+  (path, size, bold, italic) = key
+  try:
+    font = Font(path, size)
+    font.set_bold(bold)
+    font.set_italic(italic)
+    future.set_result(font)
+  except BaseException as e:
+    future.set_exception(e)
+
+
+_registry = FontRegistry()
+
+
+def get_font(path: str, size: int, bold: bool = False, italic: bool = False) -> Font:
+  return _registry.get_font(path, size, bold, italic)
+
+
+def warm_fonts(fonts: Iterable[Tuple]) -> List[Future]:
+  return _registry.warm(fonts)
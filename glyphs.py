@@ -0,0 +1,68 @@
+from typing import Tuple, Dict, List, Optional
+
+import pygame
+from pygame.color import Color
+from pygame.font import Font
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+from tracing import tracer
+
+# Glyphs that are put in the atlas up front. Other characters are rendered when they are first needed.
+ATLAS_CHARACTERS = [chr(c) for c in range(32, 127)]
+
+
+# Renders text in a monospace font by copying glyphs from an atlas that is built once per font and color, instead of
+# rasterizing every string with Font.render.
+class GlyphAtlas:
+  def __init__(self, font: Font, color: Color):
+    self._font = font
+    self._color = color
+    self.cell_size: Tuple[int, int] = (font.size(" ")[0], font.get_height())
+    self._surface = Surface((self.cell_size[0] * len(ATLAS_CHARACTERS), self.cell_size[1]), pygame.SRCALPHA)
+    # Source surface and area for each character
+    self._glyphs: Dict[str, Tuple[Surface, Optional[Rect]]] = {}
+    for i, char in enumerate(ATLAS_CHARACTERS):
+      area = Rect(i * self.cell_size[0], 0, self.cell_size[0], self.cell_size[1])
+      # MAX on a transparent surface copies the glyph's pixels including alpha, where a normal blit would blend them
+      self._surface.blit(font.render(char, True, color), area, special_flags=pygame.BLEND_RGBA_MAX)
+      self._glyphs[char] = (self._surface, area)
+
+  def render_line(self, line: str) -> Surface:
+    (cell_width, cell_height) = self.cell_size
+    surface = Surface((cell_width * len(line), cell_height), pygame.SRCALPHA)
+    glyphs = self._glyphs
+    for char in line:
+      if char not in glyphs:
+        glyphs[char] = (self._font.render(char, True, self._color), None)
+    surface.blits([(glyphs[char][0], (i * cell_width, 0), glyphs[char][1], pygame.BLEND_RGBA_MAX)
+                   for i, char in enumerate(line) if char != " "], doreturn=False)
+    return surface
+
+
+_atlases: Dict[Tuple[Font, Tuple[int, int, int, int]], GlyphAtlas] = {}
+
+
+def get_glyph_atlas(font: Font, color: Color) -> GlyphAtlas:
+  key = (font, tuple(Color(color)))
+  atlas = _atlases.get(key)
+  if atlas is None:
+    with tracer.span("build glyph atlas", "text"):
+      atlas = GlyphAtlas(font, color)
+    _atlases[key] = atlas
+  return atlas
+
+
+def is_monospace(font: Font) -> bool:
+  return len({font.size(char)[0] for char in "iW m_."}) == 1
+
+
+# Equivalent to text.wrap_text() for a monospace font that fits the given number of columns on each line
+def wrap_monospace_text(text: str, columns: int, max_lines: Optional[int] = None) -> List[str]:
+  columns = max(columns, 1)
+  lines = []
+  for paragraph in text.split("\n"):
+    lines += [paragraph[i:i + columns] for i in range(0, len(paragraph), columns)] or [""]
+  if max_lines is not None and len(lines) - 1 > max_lines:
+    return lines[:max_lines] + [""]
+  return lines
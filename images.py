@@ -1,8 +1,13 @@
-from typing import Tuple
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Any
 
 import pygame
 from pygame.color import Color
+from pygame.rect import Rect
 
+from render_backend import mark_changed
 from ui import Component, Style
 
 
@@ -19,6 +24,63 @@ class Surface(Component):
   def set_surface(self, surface):
     self._surface = surface
     super().set_size(surface.get_size())
+    self._notify_changed()
+
+
+# Shows raster data that changes often, such as video frames or heatmaps. The pixels are copied into a surface that is
+# allocated once, and updates can be limited to the area that changed. Must be updated from the UI thread.
+# NOTE: The array methods use pygame.surfarray, which needs numpy
+class PixelBuffer(Component):
+  def __init__(self, size: Tuple[int, int], **kwargs):
+    super().__init__(size, **kwargs)
+    self._surface = pygame.Surface(size, 0, 32)
+
+  # Takes an array of RGB values indexed by [x, y], covering the area (or the whole buffer)
+  def update_from_array(self, pixels, area: Optional[Rect] = None):
+    import pygame.surfarray
+    pygame.surfarray.blit_array(self._target(area), pixels)
+    mark_changed(self._surface)
+    self._notify_changed()
+
+  # Takes rows of 32 bit pixels without any padding, in the byte order of the surface (BGRX on little endian machines)
+  def update_from_buffer(self, pixels, area: Optional[Rect] = None):
+    area = Rect(area) if area is not None else self._surface.get_rect()
+    # Rows are written by offset, so an area outside the surface would write into other rows
+    if not self._surface.get_rect().contains(area):
+      raise ValueError("Area %s is outside of the buffer %s" % (area, self._surface.get_rect()))
+    data = memoryview(pixels).cast("B")
+    pitch = self._surface.get_pitch()
+    row_length = area.w * 4
+    # The view locks the surface for as long as it exists
+    target = memoryview(self._surface.get_buffer()).cast("B")
+    if area.x == 0 and row_length == pitch:
+      target[area.y * pitch:area.bottom * pitch] = data[:row_length * area.h]
+    else:
+      for row in range(area.h):
+        offset = (area.y + row) * pitch + area.x * 4
+        target[offset:offset + row_length] = data[row * row_length:(row + 1) * row_length]
+    target.release()
+    mark_changed(self._surface)
+    self._notify_changed()
+
+  # Gives write access to the pixels of the area as an array indexed by [x, y, channel], for producers that can fill it
+  # directly. The surface is locked until the array has been released, and it's assumed to be written before the next
+  # frame is rendered.
+  def pixels_array(self, area: Optional[Rect] = None):
+    import pygame.surfarray
+    mark_changed(self._surface)
+    self._notify_changed()
+    return pygame.surfarray.pixels3d(self._target(area))
+
+  def _target(self, area: Optional[Rect]):
+    return self._surface.subsurface(area) if area is not None else self._surface
+
+  # The surface has no alpha channel, so it hides whatever is behind it
+  def get_opaque_rect(self) -> Optional[Rect]:
+    return Rect(self._rect) if self._is_visible else None
+
+  def _render_contents(self, surface):
+    surface.blit(self._surface, self._rect)
 
 
 def image_surface(file_path: str, size: Tuple[int, int]) -> Surface:
@@ -30,3 +92,73 @@ def load_and_scale_image(file_path: str, size: Tuple[int, int]):
   original_image = pygame.image.load(file_path)
   original_image.convert()
   return pygame.transform.scale(original_image, size)
+
+
+# Loads images on a worker thread and scales them to fit within a given size. A quick, low quality scaling is made
+# available first and is then replaced by a smoothly scaled one. Decoding one image at a time, and immediately
+# shrinking giant ones, bounds how much decoded pixel data is held in memory.
+class ProgressiveImageLoader:
+  # Decoded images with more pixels than this are shrunk before anything else is done with them
+  MAX_DECODED_PIXELS = 4096 * 4096
+
+  def __init__(self):
+    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-loader")
+    self._generation = 0
+    self._is_pending = False
+    # Written by the worker thread: (generation, surface or exception, is_final). Guarded by the lock, so that a
+    # result that is published while poll() takes the previous one isn't lost.
+    self._result: Optional[Tuple[int, Any, bool]] = None
+    self._lock = threading.Lock()
+
+  def load(self, file_path: str, size: Tuple[int, int]):
+    self._generation += 1
+    self._is_pending = True
+    with self._lock:
+      self._result = None
+    self._executor.submit(self._load_in_background, self._generation, file_path, size)
+
+  def cancel(self):
+    self._generation += 1
+    self._is_pending = False
+
+  def is_pending(self) -> bool:
+    return self._is_pending
+
+  # Returns the newest result that hasn't been returned yet: a surface, or the exception that loading failed with
+  def poll(self) -> Optional[Any]:
+    with self._lock:
+      result = self._result
+      if not self._is_pending or result is None or result[0] != self._generation:
+        return None
+      self._result = None
+    _, surface_or_error, is_final = result
+    self._is_pending = not is_final
+    return surface_or_error
+
+  def _load_in_background(self, generation: int, file_path: str, size: Tuple[int, int]):
+    try:
+      image = pygame.image.load(file_path)
+      (width, height) = image.get_size()
+      if width * height > ProgressiveImageLoader.MAX_DECODED_PIXELS:
+        factor = math.sqrt(ProgressiveImageLoader.MAX_DECODED_PIXELS / (width * height))
+        image = pygame.transform.scale(image, (max(int(width * factor), 1), max(int(height * factor), 1)))
+      if image.get_bitsize() < 24:
+        # smoothscale only handles 24 and 32 bit surfaces. Surface.convert() can't be used off the UI thread.
+        converted = pygame.Surface(image.get_size(), pygame.SRCALPHA)
+        converted.blit(image, (0, 0))
+        image = converted
+      scaled_size = image.get_rect().fit(Rect((0, 0), size)).size
+      if generation != self._generation:
+        return
+      self._publish(generation, pygame.transform.scale(image, scaled_size), False)
+      smooth_image = pygame.transform.smoothscale(image, scaled_size)
+      if generation == self._generation:
+        self._publish(generation, smooth_image, True)
+    # Anything else, such as a missing file or running out of memory, must also end the load, as the executor would
+    # swallow the exception
+    except Exception as e:
+      self._publish(generation, e, True)
+
+  def _publish(self, generation: int, surface_or_error: Any, is_final: bool):
+    with self._lock:
+      self._result = (generation, surface_or_error, is_final)
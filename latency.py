@@ -0,0 +1,79 @@
+import time
+from collections import deque
+from typing import Dict, Deque, List, Optional, Set, Tuple
+
+import pygame
+from pygame.event import Event
+
+# Input events whose latency is measured
+TRACKED_EVENT_TYPES = (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN)
+
+
+# Measures the time from an input event to the presentation of the first frame that shows its effect. The application
+# tells the tracker which event it is handling, components call note_change() when they change what they show, and the
+# latency is recorded when the frame with the change has been presented. Events that change nothing aren't recorded.
+# NOTE: pygame doesn't expose the timestamps that SDL gives events, so events are stamped when they are taken from the
+# queue. Time spent in the queue before that (e.g. while a frame was being rendered) isn't included.
+class LatencyTracker:
+  # Samples kept for each event type. Older ones are dropped.
+  MAX_SAMPLES = 1000
+
+  def __init__(self):
+    self._samples: Dict[int, Deque[float]] = {}
+    # The event being handled: its number, type and when it was taken from the queue
+    self._current: Optional[Tuple[int, int, float]] = None
+    self._num_events = 0
+    # Events that have changed something which hasn't been presented yet
+    self._pending: Set[Tuple[int, int, float]] = set()
+
+  def begin_event(self, event: Event, timestamp: float):
+    if event.type in TRACKED_EVENT_TYPES:
+      self._num_events += 1
+      self._current = (self._num_events, event.type, timestamp)
+
+  def end_event(self):
+    self._current = None
+
+  def note_change(self):
+    if self._current is not None:
+      self._pending.add(self._current)
+
+  def frame_presented(self):
+    if not self._pending:
+      return
+    now = time.perf_counter()
+    for _, event_type, timestamp in self._pending:
+      if event_type not in self._samples:
+        self._samples[event_type] = deque(maxlen=LatencyTracker.MAX_SAMPLES)
+      self._samples[event_type].append((now - timestamp) * 1000)
+    self._pending.clear()
+
+  # Latencies in milliseconds, of one event type or of all of them
+  def get_samples(self, event_type: Optional[int] = None) -> List[float]:
+    if event_type is not None:
+      return list(self._samples.get(event_type, ()))
+    return [sample for samples in self._samples.values() for sample in samples]
+
+  # The 50th, 95th and 99th percentiles in milliseconds, or None when nothing has been recorded
+  def get_percentiles(self, event_type: Optional[int] = None) -> Optional[Tuple[float, float, float]]:
+    samples = sorted(self.get_samples(event_type))
+    if not samples:
+      return None
+    return tuple(_nearest_rank(samples, p) for p in (50, 95, 99))
+
+  def reset(self):
+    self._samples.clear()
+    self._pending.clear()
+
+
+def _nearest_rank(sorted_samples: List[float], percentile: int) -> float:
+  rank = max(-(-percentile * len(sorted_samples) // 100), 1)
+  return sorted_samples[rank - 1]
+
+
+tracker = LatencyTracker()
+
+
+# Called by components when they change in a way that shows on screen
+def note_change():
+  tracker.note_change()
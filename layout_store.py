@@ -0,0 +1,96 @@
+from itertools import chain
+from typing import List, Tuple, Optional
+
+import numpy
+from pygame.math import Vector2
+from pygame.rect import Rect
+
+from ui import Component
+
+
+# Keeps the rects of a container's children in arrays, so that positions are computed for all children at once and
+# hit-testing and culling don't have to ask every child. Containers use it when they are created with
+# layout_store=True. Children that don't position anything inside themselves are given their rects directly, the
+# others have their set_pos() called. A child that changes later is written back with update_component().
+class LayoutStore:
+  def __init__(self):
+    self.x = numpy.zeros(0)
+    self.y = numpy.zeros(0)
+    self.w = numpy.zeros(0)
+    self.h = numpy.zeros(0)
+    # The positions before rounding, which are what set_pos() is given
+    self._float_x = numpy.zeros(0)
+    self._float_y = numpy.zeros(0)
+
+  def __len__(self) -> int:
+    return len(self.x)
+
+  def layout_list(self, components: List[Component], origin: Vector2, padding: int, margin: float, horizontal: bool,
+      first_index: int = 0):
+    self._read_sizes(components)
+    along = self.w if horizontal else self.h
+    # The offset of each child is the padding plus the sizes and margins of the children before it
+    offsets = padding + numpy.concatenate(([0.0], numpy.cumsum(along + margin)[:-1]))
+    cross = numpy.full(len(components), float(padding))
+    if horizontal:
+      self._set_positions(origin[0] + offsets, origin[1] + cross)
+    else:
+      self._set_positions(origin[0] + cross, origin[1] + offsets)
+    self._apply(components, first_index)
+
+  def layout_grid(self, components: List[Component], origin: Vector2, padding: int, margin: int,
+      cell_size: Tuple[int, int], num_cols: int, first_index: int = 0):
+    self._read_sizes(components)
+    (rows, cols) = numpy.divmod(numpy.arange(len(components)), num_cols)
+    self._set_positions(origin[0] + padding + cols * (cell_size[0] + margin),
+                        origin[1] + padding + rows * (cell_size[1] + margin))
+    self._apply(components, first_index)
+
+  # Indices of the components that overlap the area, in order
+  def indices_in_rect(self, area: Rect) -> numpy.ndarray:
+    return numpy.flatnonzero((self.x < area.right) & (self.x + self.w > area.x)
+                             & (self.y < area.bottom) & (self.y + self.h > area.y))
+
+  # The index of the topmost (last) component under the point
+  def hit_test(self, pos: Tuple[int, int]) -> Optional[int]:
+    hits = self.hit_test_points(numpy.array([pos]))
+    return int(hits[0]) if hits[0] >= 0 else None
+
+  # The index of the topmost component under each of the points, or -1 where there is none
+  def hit_test_points(self, points: numpy.ndarray) -> numpy.ndarray:
+    px = points[:, 0][:, None]
+    py = points[:, 1][:, None]
+    inside = (px >= self.x) & (px < self.x + self.w) & (py >= self.y) & (py < self.y + self.h)
+    last = len(self) - 1 - numpy.argmax(inside[:, ::-1], axis=1)
+    return numpy.where(inside.any(axis=1), last, -1)
+
+  def _read_sizes(self, components: List[Component]):
+    # Much faster than building the array from a list of tuples
+    sizes = numpy.fromiter(chain.from_iterable(c.size for c in components), dtype=float,
+                           count=len(components) * 2).reshape(-1, 2)
+    self.w = sizes[:, 0]
+    self.h = sizes[:, 1]
+
+  # Takes the component's current rect, for example after it has changed its size
+  def update_component(self, index: int, component: Component):
+    rect = component.get_rect()
+    (self.x[index], self.y[index], self.w[index], self.h[index]) = rect
+    (self._float_x[index], self._float_y[index]) = rect.topleft
+
+  def _set_positions(self, x: numpy.ndarray, y: numpy.ndarray):
+    # Components round their positions down, so the same is done here
+    self._float_x = x
+    self._float_y = y
+    self.x = numpy.floor(x)
+    self.y = numpy.floor(y)
+
+  def _apply(self, components: List[Component], first_index: int):
+    xs = self._float_x[first_index:].tolist()
+    ys = self._float_y[first_index:].tolist()
+    int_xs = self.x[first_index:].astype(int).tolist()
+    int_ys = self.y[first_index:].astype(int).tolist()
+    for component, x, y, int_x, int_y in zip(components[first_index:], xs, ys, int_xs, int_ys):
+      if type(component).set_pos is Component.set_pos:
+        component._rect = Rect(int_x, int_y, *component.size)
+      else:
+        component.set_pos(Vector2(x, y))
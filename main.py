@@ -1,41 +1,50 @@
 #!/usr/bin/env python3
+# Imported first, so that the startup timeline includes the time spent importing everything else
+from startup import timeline, init_subsystems
 
 import pygame
 from pygame.color import Color
-from pygame.font import Font
 from pygame.math import Vector2
-from pygame.time import Clock, set_timer
+from pygame.time import set_timer
 
+from app import Application
 from button import button, HoldDownBehavior, icon
 from checkbox import checkbox
 from containers import ListContainer, Orientation, AbsolutePosContainer, ScrollContainer, GridContainer
 from counter import Counter
+from fonts import get_font
 from images import image_surface, load_and_scale_image
-from text import FormattedText, StaticText, TextArea
+from latency import tracker as latency_tracker
+from plot import TimeSeriesPlot
+from text import FormattedText, TextArea
+from tracing import tracer
 from ui import BackgroundGrid, Style
 
 SCREEN_RESOLUTION = (800, 600)
 COLOR_WHITE = Color(255, 255, 255)
 
 USEREVENT_EACH_SECOND = pygame.USEREVENT + 1
+# Written when tracing is turned off. Open it in a trace viewer such as https://ui.perfetto.dev
+TRACE_FILE = "trace.json"
 
 
 def main():
-  pygame.init()
+  timeline.mark("import")
+  init_subsystems()
   screen = pygame.display.set_mode(SCREEN_RESOLUTION)
-  clock = Clock()
   set_timer(USEREVENT_EACH_SECOND, 1000)
+  timeline.mark("init")
 
-  font = Font('resources/Arial Rounded Bold.ttf', 14)
+  font = get_font('resources/Arial Rounded Bold.ttf', 14)
+  timeline.mark("fonts")
   background_color = (0, 0, 0)
   grid = BackgroundGrid(SCREEN_RESOLUTION, Color(20, 20, 20), 32)
 
   fps_text = FormattedText(font, COLOR_WHITE, "FPS: %i", 0)
-  debug_texts = [
-    fps_text,
-    StaticText(font, COLOR_WHITE, "debug: 2"),
-    StaticText(font, COLOR_WHITE, "debug: 3"),
-  ]
+  # Input-to-display latency percentiles (p50/p95/p99) in milliseconds
+  click_latency_text = FormattedText(font, COLOR_WHITE, "click: %i/%i/%i ms", (0, 0, 0))
+  key_latency_text = FormattedText(font, COLOR_WHITE, "key: %i/%i/%i ms", (0, 0, 0))
+  debug_texts = [fps_text, click_latency_text, key_latency_text]
   debug_window = ListContainer(width=200, height="fit_contents", children=debug_texts, margin=5,
                                padding=5, orientation=Orientation.VERTICAL,
                                style=Style(border_color=COLOR_WHITE))
@@ -52,7 +61,7 @@ def main():
     button(font, (200, 32), callback=lambda: counter.decrement(), label="Decrement (D)", hotkey=pygame.K_d),
     checkbox(font, (200, 32), callback=lambda checked: debug_window.set_visible(checked), label="Show debug",
              checked=debug_window.is_visible()),
-    checkbox(font, (200, 32), callback=lambda checked: print("B: %s" % checked), label="B"),
+    checkbox(font, (200, 32), callback=toggle_tracing, label="Trace"),
     checkbox(font, (200, 32), callback=lambda checked: print("C: %s" % checked), label="C"),
     checkbox(font, (200, 32), callback=lambda checked: print("D: %s" % checked), label="D"),
     checkbox(font, (200, 32), callback=lambda checked: print("E: %s" % checked), label="E"),
@@ -90,53 +99,51 @@ def main():
 
   img = image_surface('resources/stone_tile.png', (100, 100))
 
+  # Milliseconds per frame
+  frame_time_plot = TimeSeriesPlot((160, 100), samples_per_column=1, value_range=(0, 50), color=Color(0, 255, 0),
+                                   style=Style(border_color=COLOR_WHITE))
+
   hud = ListContainer(width=800, height=200,
-                      children=[right_menu_bar, counter, grid_container, text_field, img],
+                      children=[right_menu_bar, counter, grid_container, text_field, img, frame_time_plot],
                       margin=5,
                       padding=5, orientation=Orientation.HORIZONTAL,
                       style=Style(border_color=COLOR_WHITE, background_color=Color(0, 0, 150)))
   container = AbsolutePosContainer(SCREEN_RESOLUTION, [(Vector2(5, 5), debug_window), (Vector2(0, 400), hud)])
   container.set_pos(Vector2(0, 0))
+  timeline.mark("tree")
 
-  while True:
-    for event in pygame.event.get():
-      handle_exit(event)
-      if event.type == pygame.MOUSEBUTTONDOWN:
-        container.handle_mouse_was_clicked(pygame.mouse.get_pos())
-      elif event.type == pygame.MOUSEBUTTONUP:
-        container.handle_mouse_was_released()
-      elif event.type == pygame.MOUSEMOTION:
-        container.handle_mouse_motion(pygame.mouse.get_pos())
-      elif event.type == USEREVENT_EACH_SECOND:
-        fps_text.format_text(int(clock.get_fps()))
-      elif event.type == pygame.KEYDOWN:
-        container.handle_key_was_pressed(event.key)
-      elif event.type == pygame.KEYUP:
-        container.handle_key_was_released(event.key)
-    elapsed_time = clock.tick()
-
-    container.update(elapsed_time)
-
-    screen.fill(background_color)
-    grid.render(screen)
-    container.render(screen)
-    pygame.display.flip()
+  app = Application(screen, container, background_color, background=grid)
+  timeline.report_after_first_frame(app)
 
+  def handle_event(event):
+    if event.type == USEREVENT_EACH_SECOND:
+      fps_text.format_text(int(app.get_fps()))
+      click_latency_text.format_text(latency_tracker.get_percentiles(pygame.MOUSEBUTTONDOWN) or (0, 0, 0))
+      key_latency_text.format_text(latency_tracker.get_percentiles(pygame.KEYDOWN) or (0, 0, 0))
 
-def number_button(font, text_area: TextArea, text: str, key):
-  return button(font, (32, 32), callback=lambda: text_area.append(text), label=text, hotkey=key,
-                hold=HoldDownBehavior(400, 60))
+  app.add_event_handler(handle_event)
+  app.add_after_frame_hook(frame_time_plot.push)
+  app.run()
 
 
-def backspace_button(font, text_area: TextArea):
-  return button(font, (32, 32), callback=lambda: text_area.backspace(), label="<-", hotkey=pygame.K_BACKSPACE,
-                hold=HoldDownBehavior(400, 60))
+def toggle_tracing(checked: bool):
+  if checked:
+    tracer.clear()
+    tracer.start()
+  else:
+    tracer.stop()
+    tracer.write(TRACE_FILE)
+    print("Wrote trace to %s" % TRACE_FILE)
 
 
-def handle_exit(event):
-  if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-    pygame.quit()
-    exit(0)
+def number_button(font, text_area: TextArea, text: str, key):
+  return button(font, (32, 32), callback=None, batch_callback=lambda n: text_area.append(text * n), label=text,
+                hotkey=key, hold=HoldDownBehavior(400, 60))
+
+
+def backspace_button(font, text_area: TextArea):
+  return button(font, (32, 32), callback=None, batch_callback=lambda n: text_area.backspace(n), label="<-",
+                hotkey=pygame.K_BACKSPACE, hold=HoldDownBehavior(400, 60))
 
 
 if __name__ == '__main__':
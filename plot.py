@@ -0,0 +1,113 @@
+from typing import Tuple, Optional
+
+import numpy
+import pygame
+from pygame.color import Color
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+from render_backend import mark_changed
+from ui import Component
+
+
+# Plots a stream of samples, newest on the right. Every pixel column shows the range (min to max) of a fixed number of
+# consecutive samples, so arbitrarily many samples cost one vertical line per column to draw. New samples are kept in a
+# ring buffer until they fill a column. When columns are completed the existing plot is scrolled to the left and only
+# the new columns are drawn.
+class TimeSeriesPlot(Component):
+  def __init__(self, size: Tuple[int, int], samples_per_column: int, value_range: Tuple[float, float],
+      color: Color, background_color: Color = Color(0, 0, 0), **kwargs):
+    super().__init__(size, **kwargs)
+    self._samples_per_column = samples_per_column
+    self._value_range = value_range
+    self._color = Color(color)
+    self._background_color = Color(background_color)
+    # Samples that don't fill a column yet. Room for one more column than fits on screen is needed when a push brings
+    # more samples than can be shown, which are then dropped a column at a time.
+    self._samples = numpy.zeros((size[0] + 1) * samples_per_column)
+    self._num_samples = 0
+    self._start = 0
+    # The envelope of each column that is on screen, oldest first
+    self._column_min = numpy.full(size[0], numpy.nan)
+    self._column_max = numpy.full(size[0], numpy.nan)
+    self._num_new_columns = 0
+    self._plot_surface: Optional[Surface] = None
+
+  def push(self, values):
+    values = numpy.asarray(values, dtype=float).ravel()
+    capacity = len(self._samples)
+    # Columns that would scroll out of view before they are drawn are dropped whole, so that the columns start at the
+    # same samples no matter how the stream was split into pushes
+    num_columns = (self._num_samples + len(values)) // self._samples_per_column
+    num_dropped = max(num_columns - len(self._column_min), 0) * self._samples_per_column
+    num_dropped_pending = min(num_dropped, self._num_samples)
+    self._start = (self._start + num_dropped_pending) % capacity
+    self._num_samples -= num_dropped_pending
+    values = values[num_dropped - num_dropped_pending:]
+    end = (self._start + self._num_samples) % capacity
+    first_part = min(len(values), capacity - end)
+    self._samples[end:end + first_part] = values[:first_part]
+    self._samples[:len(values) - first_part] = values[first_part:]
+    self._num_samples += len(values)
+    self._decimate()
+
+  def set_value_range(self, value_range: Tuple[float, float]):
+    self._value_range = value_range
+    self._num_new_columns = len(self._column_min)
+    self._notify_changed()
+
+  def _decimate(self):
+    num_columns = self._num_samples // self._samples_per_column
+    if num_columns == 0:
+      return
+    num_used = num_columns * self._samples_per_column
+    end = self._start + num_used
+    if end <= len(self._samples):
+      used = self._samples[self._start:end]
+    else:
+      used = numpy.concatenate((self._samples[self._start:], self._samples[:end - len(self._samples)]))
+    columns = used.reshape(num_columns, self._samples_per_column)
+    self._start = (self._start + num_used) % len(self._samples)
+    self._num_samples -= num_used
+
+    width = len(self._column_min)
+    num_columns = min(num_columns, width)
+    self._column_min = numpy.roll(self._column_min, -num_columns)
+    self._column_max = numpy.roll(self._column_max, -num_columns)
+    self._column_min[-num_columns:] = columns[-num_columns:].min(axis=1)
+    self._column_max[-num_columns:] = columns[-num_columns:].max(axis=1)
+    self._num_new_columns = min(self._num_new_columns + num_columns, width)
+    self._notify_changed()
+
+  # The background of the plot is drawn on the plot surface, which covers the whole component
+  def get_opaque_rect(self) -> Optional[Rect]:
+    return Rect(self._rect) if self._is_visible else None
+
+  def _render_contents(self, surface):
+    if self._plot_surface is None:
+      self._plot_surface = Surface(self.size)
+      self._plot_surface.fill(self._background_color)
+      self._num_new_columns = len(self._column_min)
+    if self._num_new_columns > 0:
+      self._draw_new_columns()
+    surface.blit(self._plot_surface, self._rect)
+
+  def _draw_new_columns(self):
+    (width, height) = self.size
+    num_new = self._num_new_columns
+    self._num_new_columns = 0
+    self._plot_surface.scroll(-num_new, 0)
+    self._plot_surface.fill(self._background_color, (width - num_new, 0, num_new, height))
+
+    (low, high) = self._value_range
+    scale = (height - 1) / (high - low)
+    # Larger values are higher up, and values outside the range are drawn at the edge
+    top = numpy.clip((high - self._column_max[-num_new:]) * scale, 0, height - 1)
+    bottom = numpy.clip((high - self._column_min[-num_new:]) * scale, 0, height - 1)
+    rows = numpy.arange(height)
+    # Columns without samples are NaN, which compares as False
+    mask = (rows >= numpy.floor(top)[:, None]) & (rows <= numpy.ceil(bottom)[:, None])
+    pixels = pygame.surfarray.pixels3d(self._plot_surface)
+    pixels[width - num_new:][mask] = (self._color.r, self._color.g, self._color.b)
+    del pixels
+    mark_changed(self._plot_surface)
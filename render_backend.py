@@ -0,0 +1,129 @@
+import weakref
+from typing import Tuple, Optional, Any, Sequence
+
+import pygame
+from pygame.color import Color
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+# Components render to a target that is either a pygame Surface (the software backend), or a RendererTarget that draws
+# with an SDL2 Renderer. Blitting works the same on both, while other drawing goes through the functions in this module,
+# which dispatch on the type of the target.
+
+# Surfaces that are changed in place after they have been blitted must be marked with mark_changed(), so that textures
+# made from them are uploaded again. Surfaces that are replaced instead need nothing.
+_surface_versions: 'weakref.WeakKeyDictionary[Surface, int]' = weakref.WeakKeyDictionary()
+
+
+def mark_changed(surface: Surface):
+  _surface_versions[surface] = _surface_versions.get(surface, 0) + 1
+
+
+def draw_rect(target, color: Color, rect: Rect, width: int = 0):
+  if isinstance(target, Surface):
+    pygame.draw.rect(target, color, rect, width)
+  else:
+    target.draw_rect(color, rect, width)
+
+
+def draw_line(target, color: Color, start: Tuple[int, int], end: Tuple[int, int]):
+  if isinstance(target, Surface):
+    pygame.draw.line(target, color, start, end)
+  else:
+    target.draw_line(color, start, end)
+
+
+# Antialiased on surfaces. The renderer draws plain lines.
+def draw_aalines(target, color: Color, closed: bool, points: Sequence[Tuple[float, float]]):
+  if isinstance(target, Surface):
+    pygame.draw.aalines(target, color, closed, points)
+  else:
+    segments = list(zip(points, points[1:]))
+    if closed:
+      segments.append((points[-1], points[0]))
+    for start, end in segments:
+      target.draw_line(color, start, end)
+
+
+def present(target):
+  if isinstance(target, Surface):
+    pygame.display.flip()
+  else:
+    target.present()
+
+
+# Draws with an SDL2 Renderer (from pygame._sdl2.video), which may composite on the GPU. Surfaces that are blitted are
+# uploaded as textures once and reused for as long as the surface exists and hasn't been marked as changed. The
+# Renderer has no clip rect, so clipping is done here.
+class RendererTarget:
+  def __init__(self, renderer):
+    self._renderer = renderer
+    self._clip: Optional[Rect] = None
+    # The texture for each surface, along with the version of the surface that it was made from
+    self._textures: 'weakref.WeakKeyDictionary[Surface, Tuple[Any, int]]' = weakref.WeakKeyDictionary()
+
+  def get_size(self) -> Tuple[int, int]:
+    return tuple(self._renderer.get_viewport().size)
+
+  def get_rect(self) -> Rect:
+    return Rect((0, 0), self.get_size())
+
+  def get_clip(self) -> Rect:
+    return Rect(self._clip) if self._clip is not None else self.get_rect()
+
+  def set_clip(self, rect: Optional[Rect]):
+    self._clip = Rect(rect) if rect is not None else None
+
+  def fill(self, color: Color, rect: Optional[Rect] = None):
+    self.draw_rect(color, rect if rect is not None else self.get_rect())
+
+  def blit(self, source: Surface, dest: Any, area: Optional[Rect] = None):
+    source_area = Rect(area) if area is not None else source.get_rect()
+    dest_rect = Rect((dest[0], dest[1]), source_area.size)
+    clipped = dest_rect.clip(self.get_clip())
+    if clipped.width == 0 or clipped.height == 0:
+      return
+    source_area = Rect(source_area.x + clipped.x - dest_rect.x, source_area.y + clipped.y - dest_rect.y,
+                       clipped.width, clipped.height)
+    self._get_texture(source).draw(srcrect=source_area, dstrect=clipped)
+
+  def draw_rect(self, color: Color, rect: Rect, width: int = 0):
+    rect = Rect(rect)
+    if width == 0:
+      self._fill_rect(color, rect)
+      return
+    # Like pygame.draw.rect(), the border is drawn on the inside of the rect
+    self._fill_rect(color, Rect(rect.x, rect.y, rect.w, width))
+    self._fill_rect(color, Rect(rect.x, rect.bottom - width, rect.w, width))
+    self._fill_rect(color, Rect(rect.x, rect.y + width, width, rect.h - 2 * width))
+    self._fill_rect(color, Rect(rect.right - width, rect.y + width, width, rect.h - 2 * width))
+
+  def draw_line(self, color: Color, start: Tuple[float, float], end: Tuple[float, float]):
+    line = self.get_clip().clipline(start, end)
+    if line:
+      self._renderer.draw_color = Color(color)
+      self._renderer.draw_line(line[0], line[1])
+
+  def present(self):
+    self._renderer.present()
+
+  def _fill_rect(self, color: Color, rect: Rect):
+    clipped = rect.clip(self.get_clip())
+    if clipped.width > 0 and clipped.height > 0:
+      self._renderer.draw_color = Color(color)
+      self._renderer.fill_rect(clipped)
+
+  def _get_texture(self, surface: Surface):
+    # Imported here, as pygame._sdl2 is only needed by this backend
+    from pygame._sdl2.video import Texture
+    version = _surface_versions.get(surface, 0)
+    cached = self._textures.get(surface)
+    if cached is not None and cached[1] == version:
+      return cached[0]
+    if cached is not None and cached[0].get_rect().size == surface.get_size():
+      texture = cached[0]
+      texture.update(surface)
+    else:
+      texture = Texture.from_surface(self._renderer, surface)
+    self._textures[surface] = (texture, version)
+    return texture
@@ -0,0 +1,89 @@
+import os
+from typing import Tuple, Optional
+
+import numpy
+import pygame
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+from render_backend import RendererTarget
+from ui import Component
+
+
+# Sets up pygame without a window, for rendering components in tests and benchmarks. Some components convert their
+# images to the display format, which needs a display mode even when nothing is shown.
+def init_headless():
+  if not pygame.display.get_init():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+  if not pygame.font.get_init():
+    pygame.font.init()
+  if pygame.display.get_surface() is None:
+    pygame.display.set_mode((1, 1))
+
+
+# Renders the component (which must have been positioned with set_pos) on an offscreen surface, and returns the part of
+# it that the component covers
+def render_to_surface(component: Component, background_color: Tuple[int, int, int] = (0, 0, 0)) -> Surface:
+  init_headless()
+  rect = component.get_rect()
+  # Components draw at their absolute position, so the surface has to reach from the origin to the component
+  surface = Surface((max(rect.right, 1), max(rect.bottom, 1)))
+  surface.fill(background_color)
+  component.render(surface)
+  return surface.subsurface(rect.clip(surface.get_rect())).copy()
+
+
+# Renders the component like render_to_surface(), but with the RendererTarget backend on SDL's software renderer
+def render_with_renderer(component: Component, background_color: Tuple[int, int, int] = (0, 0, 0)) -> Surface:
+  init_headless()
+  from pygame._sdl2.video import Window, Renderer
+  rect = component.get_rect()
+  window = Window("snapshot", size=(max(rect.right, 1), max(rect.bottom, 1)), hidden=True)
+  renderer = Renderer(window, accelerated=0)
+  target = RendererTarget(renderer)
+  target.fill(background_color)
+  component.render(target)
+  surface = renderer.to_surface()
+  window.destroy()
+  return surface.subsurface(rect.clip(surface.get_rect())).copy()
+
+
+# The rendered component as an array of RGB values, indexed by [x, y]. The backend is "surface" or "renderer".
+def render_to_array(component: Component, background_color: Tuple[int, int, int] = (0, 0, 0),
+    backend: str = "surface") -> numpy.ndarray:
+  if backend == "renderer":
+    return pygame.surfarray.array3d(render_with_renderer(component, background_color))
+  return pygame.surfarray.array3d(render_to_surface(component, background_color))
+
+
+class PixelDiff:
+  def __init__(self, mask: numpy.ndarray, max_difference: int):
+    # True for every pixel that differs by more than the tolerance
+    self.mask = mask
+    self.num_pixels = int(mask.sum())
+    self.max_difference = max_difference
+
+  def __bool__(self) -> bool:
+    return self.num_pixels > 0
+
+  # The smallest rect that contains all the differing pixels
+  def get_bounds(self) -> Optional[Rect]:
+    if not self:
+      return None
+    xs = numpy.flatnonzero(self.mask.any(axis=1))
+    ys = numpy.flatnonzero(self.mask.any(axis=0))
+    return Rect(int(xs[0]), int(ys[0]), int(xs[-1] - xs[0]) + 1, int(ys[-1] - ys[0]) + 1)
+
+  def __repr__(self):
+    return "PixelDiff(num_pixels=%i, max_difference=%i, bounds=%s)" % (self.num_pixels, self.max_difference,
+                                                                       self.get_bounds())
+
+
+# Compares two renders from render_to_array(). Channels may differ by up to tolerance without the pixel counting as
+# different.
+def pixel_diff(expected: numpy.ndarray, actual: numpy.ndarray, tolerance: int = 0) -> PixelDiff:
+  if expected.shape != actual.shape:
+    raise ValueError("Can't compare renders of different sizes: %s and %s" % (expected.shape, actual.shape))
+  difference = numpy.abs(expected.astype(numpy.int16) - actual.astype(numpy.int16)).max(axis=2)
+  return PixelDiff(difference > tolerance, int(difference.max()) if difference.size else 0)
@@ -0,0 +1,65 @@
+import time
+
+# Taken before pygame is imported, which is usually the largest part of the import phase
+_IMPORT_START = time.perf_counter()
+
+from typing import List, Optional, Tuple
+
+import pygame
+
+
+# Records how long each phase of starting up took. The module level timeline starts counting when this module is
+# imported, so entry points import it before anything else to have their imports show up as the first phase.
+class StartupTimeline:
+  def __init__(self, start: Optional[float] = None):
+    self._start = start if start is not None else time.perf_counter()
+    self._last_mark = self._start
+    self._phases: List[Tuple[str, float]] = []
+    self._is_reported = False
+
+  # Ends the current phase, giving it a name
+  def mark(self, phase: str):
+    now = time.perf_counter()
+    self._phases.append((phase, (now - self._last_mark) * 1000))
+    self._last_mark = now
+
+  def get_phases(self) -> List[Tuple[str, float]]:
+    return list(self._phases)
+
+  def get_total(self) -> float:
+    return (self._last_mark - self._start) * 1000
+
+  def report(self) -> str:
+    lines = ["Startup timeline:"]
+    lines += ["  %-16s %8.1f ms" % (phase, duration) for phase, duration in self._phases]
+    lines.append("  %-16s %8.1f ms" % ("total", self.get_total()))
+    return "\n".join(lines)
+
+  # Marks the first frame when the application has presented it, and prints the report
+  def report_after_first_frame(self, application):
+    def hook(_elapsed_time: int):
+      if not self._is_reported:
+        self._is_reported = True
+        self.mark("first frame")
+        print(self.report())
+
+    application.add_after_frame_hook(hook)
+
+
+timeline = StartupTimeline(_IMPORT_START)
+
+
+# pygame.init() brings up every subsystem, including the mixer and joysticks, which takes a noticeable part of the
+# startup time. The event queue and timers come with the display.
+def init_subsystems(display: bool = True, font: bool = True, mixer: bool = False):
+  if display:
+    pygame.display.init()
+  if font:
+    pygame.font.init()
+  if mixer:
+    ensure_mixer()
+
+
+def ensure_mixer():
+  if not pygame.mixer.get_init():
+    pygame.mixer.init()
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+class _DemoStarted(Exception):
+  pass
+
+
+# Starts one of the demos ("main", "keyboard" or "browser") without entering its main loop, and returns its
+# Application after it has run a few frames
+@pytest.fixture
+def start_demo(monkeypatch):
+  from app import Application
+
+  def start(name: str) -> Application:
+    monkeypatch.chdir(ROOT)
+    started = []
+
+    def run(application):
+      started.append(application)
+      raise _DemoStarted()
+
+    monkeypatch.setattr(Application, "run", run)
+    try:
+      if name == "main":
+        import main
+        main.main()
+      elif name == "keyboard":
+        import keyboard_demo
+        keyboard_demo.main()
+      else:
+        import file_browser_demo
+        file_browser_demo.FileBrowser()
+    except _DemoStarted:
+      pass
+    application = started[0]
+    # Waiting for input would block the test
+    application._idle_when_static = False
+    for _ in range(3):
+      application.run_frame()
+    return application
+
+  return start
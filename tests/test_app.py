@@ -0,0 +1,55 @@
+import os
+import time
+
+import pygame
+from pygame.event import Event
+from pygame.math import Vector2
+
+from app import Application, coalesce_mouse_motion
+from button import button, HoldDownBehavior
+from containers import AbsolutePosContainer
+from fonts import get_font
+from snapshot import init_headless
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "consola.ttf")
+
+
+def motion(pos):
+  return Event(pygame.MOUSEMOTION, pos=pos, rel=(1, 0), buttons=(0, 0, 0))
+
+
+def test_motion_is_coalesced():
+  events = coalesce_mouse_motion([motion((1, 1)), motion((2, 1)), motion((3, 1))])
+  assert [(e.type, e.pos) for e in events] == [(pygame.MOUSEMOTION, (3, 1))]
+  assert events[0].rel == (3, 0)
+
+
+# The wheel scrolls what is under the pointer, so motion before it must be handled before it
+def test_motion_is_not_moved_across_wheel_or_buttons():
+  for event in (Event(pygame.MOUSEWHEEL, x=0, y=1), Event(pygame.MOUSEBUTTONDOWN, pos=(2, 1), button=1),
+                Event(pygame.MOUSEBUTTONUP, pos=(2, 1), button=1)):
+    events = coalesce_mouse_motion([motion((1, 1)), motion((2, 1)), event, motion((3, 1))])
+    assert [e.type for e in events] == [pygame.MOUSEMOTION, event.type, pygame.MOUSEMOTION]
+    assert events[0].pos == (2, 1)
+
+
+# The repeats of a held down key from all the fixed timesteps of a frame reach the batch callback in one call
+def test_held_key_fires_batch_callback_once_per_frame():
+  init_headless()
+  calls = []
+  key = button(get_font(FONT_PATH, 14), (60, 24), callback=None, label="x", hotkey=pygame.K_x,
+               hold=HoldDownBehavior(0, 10), batch_callback=calls.append)
+  container = AbsolutePosContainer((100, 100), [(Vector2(0, 0), key)])
+  container.set_pos(Vector2(0, 0))
+  application = Application(pygame.display.get_surface(), container, target_fps=0, update_interval=10,
+                            frame_budget=1000, idle_when_static=False)
+  pygame.event.clear()
+  pygame.event.post(Event(pygame.KEYDOWN, key=pygame.K_x))
+  application.run_frame()
+  assert calls == [1]
+  for _ in range(3):
+    del calls[:]
+    time.sleep(0.05)
+    application.run_frame()
+    assert len(calls) == 1
+    assert calls[0] > 1
@@ -0,0 +1,101 @@
+import os
+import random
+
+import pytest
+from pygame.color import Color
+from pygame.math import Vector2
+
+from button import button
+from containers import ListContainer, GridContainer, AbsolutePosContainer, EvenSpacingContainer, ScrollContainer, \
+  Orientation
+from fonts import get_font
+from snapshot import init_headless, render_to_array, pixel_diff
+from ui import Style
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources",
+                         "Arial Rounded Bold.ttf")
+STYLE = Style(background_color=Color(0, 0, 150), border_color=Color(255, 255, 255))
+
+
+def labelled_button(label: str):
+  return button(get_font(FONT_PATH, 14), (60, 24), callback=lambda: None, label=label)
+
+
+CONTAINER_TYPES = {
+  "list": lambda children: ListContainer(width=400, height=400, children=children, margin=3, padding=5,
+                                         orientation=Orientation.VERTICAL, style=STYLE),
+  "list with auto margin": lambda children: ListContainer(width=400, height=300, children=children, margin="auto",
+                                                          padding=5, orientation=Orientation.VERTICAL, style=STYLE),
+  "list with layout store": lambda children: ListContainer(width=700, height=40, children=children,
+                                                           margin=3, padding=5, orientation=Orientation.HORIZONTAL,
+                                                           style=STYLE, layout_store=True),
+  "grid": lambda children: GridContainer(children=children, dimensions=(4, 5), padding=5, margin=2, style=STYLE),
+  "grid with layout store": lambda children: GridContainer(children=children, dimensions=(4, 5), padding=5,
+                                                           margin=2, style=STYLE, layout_store=True),
+  "even spacing": lambda children: EvenSpacingContainer(600, 40, children, padding=5, style=STYLE),
+  "scroll": lambda children: ScrollContainer(height=100, children=children, padding=5, margin=3, style=STYLE),
+}
+
+
+# Adding and removing children after construction lays them out like a container built with the final children.
+# Containers keep their size when their children change, so the sizes are fixed here.
+@pytest.mark.parametrize("container_type", CONTAINER_TYPES)
+def test_changed_children_match_new_container(container_type):
+  init_headless()
+  create = CONTAINER_TYPES[container_type]
+  rng = random.Random(container_type)
+  children = [labelled_button(str(i)) for i in range(5)]
+  container = create(list(children))
+  container.set_pos(Vector2(10, 10))
+  render_to_array(container)
+  for i in range(12):
+    if len(children) > 1 and rng.random() < 0.4:
+      child = rng.choice(children)
+      children.remove(child)
+      container.remove_child(child)
+    else:
+      child = labelled_button("new %i" % i)
+      index = rng.randint(0, len(children))
+      children.insert(index, child)
+      container.insert_child(index, child)
+    fresh = create([labelled_button(c._label._text) for c in children])
+    fresh.set_pos(Vector2(10, 10))
+    diff = pixel_diff(render_to_array(fresh), render_to_array(container))
+    assert not diff, "after change %i: %s" % (i, diff)
+
+
+def test_absolute_pos_container_children():
+  init_headless()
+  first = labelled_button("first")
+  container = AbsolutePosContainer((300, 200), [(Vector2(5, 5), first)])
+  container.set_pos(Vector2(0, 0))
+  second = labelled_button("second")
+  container.insert_positioned_child(1, Vector2(50, 60), second)
+  assert second.get_rect().topleft == (50, 60)
+  container.remove_child(first)
+  fresh = AbsolutePosContainer((300, 200), [(Vector2(50, 60), labelled_button("second"))])
+  fresh.set_pos(Vector2(0, 0))
+  assert not pixel_diff(render_to_array(fresh), render_to_array(container))
+
+
+def test_absolute_pos_container_places_children_without_position_at_origin():
+  init_headless()
+  container = AbsolutePosContainer((300, 200), [(Vector2(5, 5), labelled_button("first"))])
+  container.set_pos(Vector2(20, 30))
+  child = labelled_button("second")
+  container.add_child(child)
+  assert child.get_rect().topleft == (20, 30)
+  container.replace_children([child])
+  assert container._positioned_children == [(Vector2(0, 0), child)]
+
+
+def test_grid_rejects_children_that_dont_fit():
+  init_headless()
+  grid = GridContainer(children=[labelled_button("0")], dimensions=(2, 1), padding=5, margin=2)
+  grid.set_pos(Vector2(0, 0))
+  grid.add_child(labelled_button("1"))
+  with pytest.raises(Exception, match="Cannot fit 3 children"):
+    grid.add_child(labelled_button("2"))
+  with pytest.raises(Exception, match="doesn't fit in grid cells"):
+    grid.replace_children([button(get_font(FONT_PATH, 14), (80, 24), callback=lambda: None, label="wide")])
+  assert len(grid._children) == 2
@@ -0,0 +1,65 @@
+import os
+import time
+
+import numpy
+import pytest
+from pygame.math import Vector2
+from pygame.rect import Rect
+
+from images import ProgressiveImageLoader, PixelBuffer
+from snapshot import init_headless, render_to_array
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+
+def poll_until_done(loader: ProgressiveImageLoader, timeout: float = 5):
+  results = []
+  deadline = time.monotonic() + timeout
+  while loader.is_pending() and time.monotonic() < deadline:
+    result = loader.poll()
+    if result is not None:
+      results.append(result)
+    time.sleep(0.001)
+  return results
+
+
+def test_loads_image():
+  init_headless()
+  loader = ProgressiveImageLoader()
+  loader.load(os.path.join(RESOURCES, "stone_tile.png"), (16, 16))
+  results = poll_until_done(loader)
+  assert not loader.is_pending()
+  # Scaled to fit, keeping the aspect ratio
+  (width, height) = results[-1].get_size()
+  assert max(width, height) == 16 and min(width, height) <= 16
+
+
+def test_missing_file_ends_the_load():
+  init_headless()
+  loader = ProgressiveImageLoader()
+  loader.load(os.path.join(RESOURCES, "does_not_exist.png"), (16, 16))
+  results = poll_until_done(loader)
+  assert not loader.is_pending()
+  assert len(results) == 1 and isinstance(results[0], Exception)
+
+
+def test_pixel_buffer_rejects_area_outside_of_it():
+  init_headless()
+  buffer = PixelBuffer((64, 48))
+  buffer.set_pos(Vector2(0, 0))
+  pixels = numpy.full(10 * 5, 0xFFFFFFFF, dtype=numpy.uint32)
+  with pytest.raises(ValueError):
+    buffer.update_from_buffer(pixels, Rect(60, 40, 10, 5))
+  with pytest.raises(ValueError):
+    buffer.update_from_array(numpy.zeros((10, 5, 3)), Rect(60, 40, 10, 5))
+  assert not render_to_array(buffer).any()
+
+
+def test_pixel_buffer_update_from_buffer():
+  init_headless()
+  buffer = PixelBuffer((64, 48))
+  buffer.set_pos(Vector2(0, 0))
+  buffer.update_from_buffer(numpy.full(4 * 3, 0xFFFFFFFF, dtype=numpy.uint32), Rect(60, 45, 4, 3))
+  pixels = render_to_array(buffer)
+  assert pixels[60:, 45:].all()
+  assert pixels.sum() == 4 * 3 * 3 * 255
@@ -0,0 +1,40 @@
+import os
+
+from pygame.color import Color
+from pygame.math import Vector2
+from pygame.rect import Rect
+
+from containers import ListContainer, Orientation, GridContainer
+from fonts import get_font
+from snapshot import init_headless
+from text import StaticText
+from ui import Component
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "consola.ttf")
+
+
+def test_children_get_the_same_rects_as_from_set_pos():
+  children = [Component((10 + i % 7, 5 + i % 3)) for i in range(50)]
+  expected_children = [Component(c.size) for c in children]
+  grid = GridContainer(children=children, dimensions=(10, 5), padding=3, margin=2, layout_store=True)
+  expected = GridContainer(children=expected_children, dimensions=(10, 5), padding=3, margin=2)
+  grid.set_pos(Vector2(7, 9))
+  expected.set_pos(Vector2(7, 9))
+  assert [c.get_rect() for c in children] == [c.get_rect() for c in expected_children]
+
+
+# A child that grows is found where it has grown to, without laying out the container again
+def test_changed_child_is_written_back():
+  init_headless()
+  font = get_font(FONT_PATH, 14)
+  children = [StaticText(font, Color(255, 255, 255), "ab") for _ in range(3)]
+  container = ListContainer(width=400, height=100, children=children, margin=4, padding=2,
+                            orientation=Orientation.VERTICAL, layout_store=True)
+  container.set_pos(Vector2(0, 0))
+  right = children[1].get_rect().right
+  assert container._layout_store.hit_test((right + 5, children[1].get_rect().y)) is None
+
+  children[1].set_text("a much longer text")
+  point = (right + 5, children[1].get_rect().y)
+  assert container._layout_store.hit_test(point) == 1
+  assert 1 in container._layout_store.indices_in_rect(Rect(point, (1, 1)))
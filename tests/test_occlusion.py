@@ -0,0 +1,57 @@
+import pygame
+import pytest
+from pygame.rect import Rect
+
+import ui
+from plot import TimeSeriesPlot
+from snapshot import pixel_diff
+from ui import subtract_rects
+
+
+# Every frame is drawn from scratch, so anything left of the magenta fill wasn't drawn
+def run_frame(application, occlusion_culling: bool):
+  pygame.display.get_surface().fill((255, 0, 255))
+  ui.set_occlusion_culling(occlusion_culling)
+  try:
+    application.run_frame()
+  finally:
+    ui.set_occlusion_culling(True)
+  return pygame.surfarray.array3d(pygame.display.get_surface())
+
+
+def find_components(component, component_type):
+  found = [component] if isinstance(component, component_type) else []
+  for child in getattr(component, "_children", []):
+    found += find_components(child, component_type)
+  return found
+
+
+# Skipping what opaque components cover must not change what ends up on screen. The frame time plot in the main demo
+# scrolls every frame, so it is left out of the comparison.
+@pytest.mark.parametrize("demo", ["main", "keyboard", "browser"])
+def test_occlusion_doesnt_change_the_frame(start_demo, demo):
+  application = start_demo(demo)
+  diff = pixel_diff(run_frame(application, False), run_frame(application, True))
+  for plot in find_components(application._container, TimeSeriesPlot):
+    rect = plot.get_rect()
+    diff.mask[rect.left:rect.right, rect.top:rect.bottom] = False
+  assert not diff.mask.any(), diff
+
+
+def test_opaque_container_hides_the_screen_background(start_demo):
+  application = start_demo("main")
+  occluders = []
+  application._container.collect_occluders(occluders)
+  # The HUD at the bottom has an opaque background
+  assert occluders == [Rect(0, 400, 800, 200)]
+
+
+def test_subtract_rects():
+  pieces = subtract_rects(Rect(0, 0, 10, 10), [Rect(2, 2, 3, 3), Rect(8, -5, 10, 30)])
+  covered = set()
+  for piece in pieces:
+    cells = {(x, y) for x in range(piece.left, piece.right) for y in range(piece.top, piece.bottom)}
+    assert not cells & covered
+    covered |= cells
+  expected = {(x, y) for x in range(8) for y in range(10)} - {(x, y) for x in range(2, 5) for y in range(2, 5)}
+  assert covered == expected
@@ -0,0 +1,45 @@
+import random
+
+import numpy
+from pygame.color import Color
+from pygame.math import Vector2
+
+from plot import TimeSeriesPlot
+from snapshot import init_headless, render_to_array, pixel_diff
+
+
+def plot(width: int, samples_per_column: int) -> TimeSeriesPlot:
+  component = TimeSeriesPlot((width, 20), samples_per_column, (0, 1), Color(0, 255, 0))
+  component.set_pos(Vector2(0, 0))
+  return component
+
+
+# The columns must not depend on how the samples were split into pushes
+def test_chunked_pushes_match_one_push():
+  init_headless()
+  rng = random.Random(0)
+  for _ in range(50):
+    width = rng.randint(1, 40)
+    samples_per_column = rng.randint(1, 10)
+    samples = numpy.array([rng.random() for _ in range(rng.randint(0, 3 * width * samples_per_column))])
+    bulk = plot(width, samples_per_column)
+    bulk.push(samples)
+    chunked = plot(width, samples_per_column)
+    start = 0
+    while start < len(samples):
+      end = start + rng.randint(1, 2 * width * samples_per_column)
+      chunked.push(samples[start:end])
+      start = end
+    diff = pixel_diff(render_to_array(bulk), render_to_array(chunked))
+    assert not diff, "width %i, %i samples per column, %i samples: %s" % (width, samples_per_column, len(samples),
+                                                                         diff)
+
+
+def test_one_sample_per_column():
+  init_headless()
+  component = plot(4, 1)
+  component.push([0, 1, 0, 1, 1])
+  pixels = render_to_array(component)
+  # Larger values are drawn higher up, the newest sample on the right
+  assert [tuple(pixels[x, 0]) for x in range(4)] == [(0, 255, 0), (0, 0, 0), (0, 255, 0), (0, 255, 0)]
+  assert [tuple(pixels[x, 19]) for x in range(4)] == [(0, 0, 0), (0, 255, 0), (0, 0, 0), (0, 0, 0)]
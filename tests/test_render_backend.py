@@ -0,0 +1,22 @@
+import pytest
+
+from containers import ScrollContainer
+from snapshot import render_to_array, pixel_diff
+
+
+def find_components(component, component_type):
+  found = [component] if isinstance(component, component_type) else []
+  for child in getattr(component, "_children", []):
+    found += find_components(child, component_type)
+  return found
+
+
+# The renderer blends text slightly differently, and draws the scrollbar arrows without antialiasing
+@pytest.mark.parametrize("demo", ["main", "keyboard", "browser"])
+def test_renderer_matches_surface_backend(start_demo, demo):
+  container = start_demo(demo)._container
+  diff = pixel_diff(render_to_array(container), render_to_array(container, backend="renderer"), tolerance=3)
+  for scroll_container in find_components(container, ScrollContainer):
+    scrollbar = scroll_container._scrollbar
+    diff.mask[scrollbar.left:scrollbar.right, scrollbar.top:scrollbar.bottom] = False
+  assert not diff.mask.any(), diff
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from pygame.color import Color
+from pygame.math import Vector2
+
+from button import button
+from checkbox import checkbox
+from containers import ScrollContainer, Orientation
+from fonts import get_font
+from snapshot import init_headless, render_to_array, pixel_diff
+from text import StaticText
+from ui import Style
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources",
+                         "Arial Rounded Bold.ttf")
+
+
+# Like the right menu bar in main.py
+def menu_bar() -> ScrollContainer:
+  font = get_font(FONT_PATH, 14)
+  children = [
+    button(font, (200, 32), callback=lambda: None, label="Increment (I)"),
+    button(font, (200, 32), callback=lambda: None, label="Decrement (D)"),
+  ] + [checkbox(font, (200, 32), callback=lambda checked: None, label=label) for label in "ABCDEF"]
+  container = ScrollContainer(height=166, children=children, margin=5, padding=5, orientation=Orientation.VERTICAL,
+                              style=Style(background_color=Color(150, 210, 255), border_color=Color(255, 255, 255)))
+  container.set_pos(Vector2(0, 0))
+  return container
+
+
+# Scrolling shifts the buffer and only repaints the exposed strip, which must look the same as painting it all
+def test_scrolling_matches_full_repaint():
+  init_headless()
+  for step in (1, 3, 9):
+    scrolled = menu_bar()
+    render_to_array(scrolled)
+    for num_steps in range(1, 20):
+      scrolled.scroll(step)
+      fresh = menu_bar()
+      fresh.scroll(num_steps * step)
+      diff = pixel_diff(render_to_array(fresh), render_to_array(scrolled))
+      assert not diff, "scrolled %i times by %i: %s" % (num_steps, step, diff)
+
+
+def test_scrolling_back_matches_full_repaint():
+  init_headless()
+  for step in (1, 5, 9):
+    scrolled = menu_bar()
+    scrolled.scroll(100)
+    render_to_array(scrolled)
+    for _ in range(10):
+      scrolled.scroll(-step)
+      render_to_array(scrolled)
+    fresh = menu_bar()
+    fresh.scroll(100 - 10 * step)
+    diff = pixel_diff(render_to_array(fresh), render_to_array(scrolled))
+    assert not diff, "scrolled back in steps of %i: %s" % (step, diff)
+
+
+def change_label(container: ScrollContainer):
+  container._children[2].set_label("Changed")
+
+
+def hide_checkbox(container: ScrollContainer):
+  container._children[4].set_visible(False)
+
+
+def shorten_text(container: ScrollContainer):
+  container._children[0].set_text("Short")
+
+
+# Children that are changed without any input reaching the container, e.g. from another component's callback, must not
+# keep showing their old pixels from the buffer
+@pytest.mark.parametrize("change", [change_label, hide_checkbox, shorten_text])
+def test_child_changed_from_outside_is_repainted(change):
+  init_headless()
+  containers = []
+  for _ in range(2):
+    container = menu_bar()
+    container.insert_child(0, StaticText(get_font(FONT_PATH, 14), Color(255, 255, 255), "A rather long line of text"))
+    container.scroll(10)
+    containers.append(container)
+  (changed, fresh) = containers
+  render_to_array(changed)
+  change(changed)
+  change(fresh)
+  diff = pixel_diff(render_to_array(fresh), render_to_array(changed))
+  assert not diff, diff
@@ -0,0 +1,31 @@
+import numpy
+import pytest
+from pygame.color import Color
+from pygame.math import Vector2
+from pygame.rect import Rect
+
+from snapshot import init_headless, render_to_array, pixel_diff
+from ui import Component, Style
+
+
+def test_render_to_array_covers_the_component():
+  init_headless()
+  component = Component((4, 3), style=Style(background_color=Color(255, 0, 0)))
+  component.set_pos(Vector2(10, 20))
+  pixels = render_to_array(component, background_color=(0, 0, 255))
+  assert pixels.shape == (4, 3, 3)
+  assert (pixels == (255, 0, 0)).all()
+
+
+def test_pixel_diff():
+  expected = numpy.zeros((5, 4, 3), dtype=numpy.uint8)
+  actual = expected.copy()
+  assert not pixel_diff(expected, actual)
+  actual[1, 2] = (0, 3, 0)
+  actual[3, 3] = (10, 0, 0)
+  diff = pixel_diff(expected, actual)
+  assert diff.num_pixels == 2 and diff.max_difference == 10
+  assert diff.get_bounds() == Rect(1, 2, 3, 2)
+  assert pixel_diff(expected, actual, tolerance=3).num_pixels == 1
+  with pytest.raises(ValueError):
+    pixel_diff(expected, actual[:4])
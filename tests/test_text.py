@@ -0,0 +1,38 @@
+import os
+import random
+
+import pytest
+from pygame.color import Color
+from pygame.math import Vector2
+
+from fonts import get_font
+from snapshot import init_headless
+from text import TextArea, layout_text
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+
+# Edits only wrap the paragraphs that they changed, which must give the same lines as laying out the whole text
+@pytest.mark.parametrize("font_file", ["consola.ttf", "Arial Rounded Bold.ttf"])
+def test_edited_text_area_matches_full_layout(font_file):
+  init_headless()
+  font = get_font(os.path.join(RESOURCES, font_file), 14)
+  area = TextArea(font, Color(255, 255, 255), (200, 120), padding=5)
+  area.set_pos(Vector2(0, 0))
+  area.set_text("\n".join("paragraph %i that is long enough to wrap" % i for i in range(8)))
+  rng = random.Random(font_file)
+  for _ in range(300):
+    operation = rng.choice(["insert", "append", "backspace", "delete", "move_caret"])
+    if operation == "insert":
+      area.insert(rng.choice(["x", " word", "\n", "a\nb"]))
+    elif operation == "append":
+      area.append(rng.choice(["y", "\nnew paragraph"]))
+    elif operation == "backspace":
+      area.backspace(rng.randint(1, 3))
+    elif operation == "delete":
+      area.delete()
+    else:
+      area.set_caret(rng.randint(0, len(area.get_text())))
+    expected = layout_text(font, area.get_text(), area._text_width(), area._max_lines(), area._buffer.get_caret(),
+                           columns=area._columns())
+    assert (area._lines, area._caret_location) == expected
@@ -0,0 +1,36 @@
+import random
+
+from text_buffer import GapBuffer
+
+
+# The paragraphs are read through the newline positions, which must stay in step with the text through all edits
+def test_paragraphs_match_split_text():
+  rng = random.Random(1)
+  for _ in range(200):
+    text = "".join(rng.choice("ab\n") for _ in range(rng.randint(0, 30)))
+    buffer = GapBuffer(text)
+    caret = len(text)
+    for _ in range(50):
+      operation = rng.choice(["insert", "delete_backward", "delete_forward", "move_caret"])
+      if operation == "insert":
+        inserted = "".join(rng.choice("xy\n") for _ in range(rng.randint(0, 5)))
+        buffer.insert(inserted)
+        text = text[:caret] + inserted + text[caret:]
+        caret += len(inserted)
+      elif operation == "delete_backward":
+        num_chars = rng.randint(0, 4)
+        buffer.delete_backward(num_chars)
+        text = text[:max(caret - num_chars, 0)] + text[caret:]
+        caret = max(caret - num_chars, 0)
+      elif operation == "delete_forward":
+        num_chars = rng.randint(0, 4)
+        buffer.delete_forward(num_chars)
+        text = text[:caret] + text[caret + num_chars:]
+      else:
+        caret = rng.randint(0, len(text))
+        buffer.move_caret(caret)
+      paragraphs = text.split("\n")
+      assert list(buffer.get_paragraphs()) == paragraphs
+      assert [buffer.get_paragraph_start(i) for i in range(len(paragraphs))] \
+             == [sum(len(p) + 1 for p in paragraphs[:i]) for i in range(len(paragraphs))]
+      assert buffer.get_text() == text
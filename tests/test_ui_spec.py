@@ -0,0 +1,63 @@
+import os
+
+from snapshot import init_headless
+from ui_spec import UiSpecLoader
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+SPEC = {
+  "fonts": {"default": {"path": os.path.join(RESOURCES, "consola.ttf"), "size": 14}},
+  "root": {"type": "AbsolutePosContainer", "children": [
+    {"type": "ListContainer", "pos": [10, 20], "width": "fit_contents", "height": "fit_contents", "margin": 4,
+     "padding": 2, "orientation": "vertical", "children": [
+      {"type": "StaticText", "font": "default", "text": "Hello"},
+      {"type": "checkbox", "font": "default", "size": [120, 24], "label": "Check"},
+    ]},
+  ]},
+}
+
+
+def rects(loader: UiSpecLoader):
+  return [component.get_rect() for _, component in loader._built_nodes]
+
+
+def test_cached_layout_matches_measured_layout(tmp_path):
+  init_headless()
+  measured = UiSpecLoader(layout_cache_dir=str(tmp_path))
+  measured.build(SPEC, (200, 100))
+  assert len(os.listdir(tmp_path)) == 1
+
+  cached = UiSpecLoader(layout_cache_dir=str(tmp_path))
+  cached.build(SPEC, (200, 100))
+  assert rects(cached) == rects(measured)
+  assert len(os.listdir(tmp_path)) == 1
+
+
+def test_changed_inputs_use_another_cache_entry(tmp_path):
+  init_headless()
+  UiSpecLoader(layout_cache_dir=str(tmp_path)).build(SPEC, (200, 100))
+  UiSpecLoader(layout_cache_dir=str(tmp_path)).build(SPEC, (300, 100))
+  bigger_font = dict(SPEC, fonts={"default": dict(SPEC["fonts"]["default"], size=20)})
+  loader = UiSpecLoader(layout_cache_dir=str(tmp_path))
+  loader.build(bigger_font, (200, 100))
+  assert len(os.listdir(tmp_path)) == 3
+  assert rects(loader) == rects(_build_uncached(bigger_font))
+
+
+def test_stale_cache_is_rewritten(tmp_path):
+  init_headless()
+  loader = UiSpecLoader(layout_cache_dir=str(tmp_path))
+  loader.build(SPEC, (200, 100))
+  [cache_file] = os.listdir(tmp_path)
+  with open(os.path.join(tmp_path, cache_file), "w") as f:
+    f.write('{"rects": []}')
+
+  UiSpecLoader(layout_cache_dir=str(tmp_path)).build(SPEC, (200, 100))
+  with open(os.path.join(tmp_path, cache_file), "r") as f:
+    assert f.read() != '{"rects": []}'
+
+
+def _build_uncached(spec):
+  loader = UiSpecLoader()
+  loader.build(spec, (200, 100))
+  return loader
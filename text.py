@@ -1,9 +1,16 @@
-from typing import Tuple, Any, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Tuple, Any, Optional, List, Deque, Dict, Sequence
 
 from pygame.color import Color
 from pygame.font import Font
 from pygame.math import Vector2
 
+from glyphs import get_glyph_atlas, is_monospace, wrap_monospace_text
+from text_buffer import GapBuffer
+from tracing import tracer
 from ui import Component
 
 
@@ -17,7 +24,9 @@ class StaticText(Component):
     self._update_text()
 
   def _update_text(self):
-    self._rendered_text = self._font.render(self._text, True, self._color)
+    with tracer.span("rasterize text", "text"):
+      self._rendered_text = self._font.render(self._text, True, self._color)
+    self._notify_changed()
 
   def set_text(self, text: str):
     self.set_size(self._font.size(text))
@@ -40,12 +49,15 @@ class FormattedText(Component):
     self._format_string = format_string
     self._font = font
     self._color = color
-    self._rendered_text = self._font.render(text, True, color)
+    with tracer.span("rasterize text", "text"):
+      self._rendered_text = self._font.render(text, True, color)
 
   def format_text(self, variable: Any):
     text = self._format_string % variable
     self.size = self._font.size(text)
-    self._rendered_text = self._font.render(text, True, self._color)
+    with tracer.span("rasterize text", "text"):
+      self._rendered_text = self._font.render(text, True, self._color)
+    self._notify_changed()
 
   def _render_contents(self, surface):
     surface.blit(self._rendered_text, self._rect)
@@ -54,10 +66,12 @@ class FormattedText(Component):
 class EditableText(Component):
   def __init__(self, font, size: Tuple[int, int], padding: int, max_length: int, **kwargs):
     super().__init__(size, **kwargs)
-    self._contents = ""
-    self._text = StaticText(font, Color(255, 255, 255), self._contents)
+    self._contents = GapBuffer()
+    self._text = self._adopt(StaticText(font, Color(255, 255, 255), ""))
     self._padding = padding
     self._max_length = max_length
+    self._batch_depth = 0
+    self._is_update_deferred = False
 
   def _render_contents(self, surface):
     self._text.render(surface)
@@ -67,14 +81,41 @@ class EditableText(Component):
     text_pos = pos + Vector2(self._padding, self._padding)
     self._text.set_pos(text_pos)
 
+  # Inserts at the caret, which is at the end unless it has been moved
   def append(self, text: str):
-    self._contents += text
-    self._contents = self._contents[0:self._max_length]
-    self._text.set_text(self._contents)
+    self._contents.insert(text[:self._max_length - len(self._contents)])
+    self._update_text()
+
+  def backspace(self, num_chars: int = 1):
+    self._contents.delete_backward(num_chars)
+    self._update_text()
+
+  def delete(self):
+    self._contents.delete_forward()
+    self._update_text()
 
-  def backspace(self):
-    self._contents = self._contents[0:-1]
-    self._text.set_text(self._contents)
+  def move_caret(self, delta: int):
+    self._contents.move_caret(self._contents.get_caret() + delta)
+
+  def get_text(self) -> str:
+    return self._contents.get_text()
+
+  @contextmanager
+  def batch_edits(self):
+    self._batch_depth += 1
+    try:
+      yield self
+    finally:
+      self._batch_depth -= 1
+      if self._batch_depth == 0 and self._is_update_deferred:
+        self._is_update_deferred = False
+        self._update_text()
+
+  def _update_text(self):
+    if self._batch_depth > 0:
+      self._is_update_deferred = True
+    else:
+      self._text.set_text(self._contents.get_text())
 
 
 class BlinkingCursor:
@@ -93,86 +134,373 @@ class BlinkingCursor:
   def is_visible(self):
     return self._visible
 
+  def time_until_update(self) -> int:
+    return max(self._cooldown, 0)
+
 
+# NOTE: If scrollback is given, the text area acts as a terminal: only the last (unterminated) line is kept as text,
+# while completed lines are moved into a ring buffer of at most that many wrapped lines. The tail is shown, and the
+# history can be scrolled back through. Terminal mode doesn't do asynchronous layout, as it only wraps new text.
+# Otherwise the text is kept in a gap buffer that can be edited at the caret.
+# Monospace fonts are drawn from a glyph atlas and wrapped by counting characters rather than measuring them.
 class TextArea(Component):
+  PLACEHOLDER_TEXT = "Loading..."
+  # Number of lines that are rendered before they are handed over to the UI thread in asynchronous mode
+  ASYNC_LINE_BATCH = 8
+  # Lines per mouse wheel step in terminal mode
+  WHEEL_SCROLL_LINES = 3
+  # Number of wrapped paragraphs that are remembered between layouts
+  WRAP_CACHE_SIZE = 256
+
   def __init__(self, font, color: Color, size: Tuple[int, int], padding: int,
-      blinking_cursor: Optional[BlinkingCursor] = None, **kwargs):
+      blinking_cursor: Optional[BlinkingCursor] = None, async_layout: bool = False,
+      scrollback: Optional[int] = None, **kwargs):
     super().__init__(size, **kwargs)
-    self._text = ""
+    self._buffer = GapBuffer()
+    # Lines that were terminated by a newline keep it, so that backspace can tell them apart from wrapped lines
+    self._history: Optional[Deque[str]] = deque(maxlen=scrollback) if scrollback is not None else None
+    self._current_line = ""
+    self._scroll_offset = 0
     self._padding = padding
     self._font = font
     self._color = color
+    self._atlas = get_glyph_atlas(font, color) if is_monospace(font) else None
     self._blinking_cursor = blinking_cursor
+    self._cursor_surface = None
+    self._async_layout = async_layout
+    self._lines: List[str] = []
     self._line_surfaces = []
+    self._line_surface_cache: Dict[str, Any] = {}
+    self._wrap_cache: Dict[str, List[str]] = {}
+    # (line index, column) among the visible lines, or None if the caret isn't visible
+    self._caret_location: Optional[Tuple[int, int]] = None
+    self._batch_depth = 0
+    self._is_render_deferred = False
+    self._layout_generation = 0
+    self._is_layout_pending = False
+    # Written by the layout worker thread, picked up by update() on the UI thread
+    self._finished_layout: Optional[Tuple[int, List[str], List[Any], Optional[Tuple[int, int]], bool]] = None
 
   def set_pos(self, pos: Vector2):
     super().set_pos(pos)
     self._render_text()
 
   def update(self, elapsed_time: int):
-    if self._blinking_cursor and self._blinking_cursor.update(elapsed_time):
-      self._render_text()
-
-  def _render_text(self):
-    self._line_surfaces = []
-    line_start_index = 0
-    final_line = ""
-    accumulated_height = 0
-    height_limit = self._rect.h - self._padding * 2
-
-    for i in range(len(self._text)):
-
-      # 1. Handle newline char
-      if self._text[i] == '\n':
-        line = self._text[line_start_index:i]
-        surface = self._render_line(line)
-        height = surface.get_size()[1]
-        if accumulated_height + height > height_limit:
-          break
-        self._line_surfaces.append(surface)
-        accumulated_height += height
-        line_start_index = i + 1
-
-      # 2. Break line if it exceeds max length
-      window = self._text[line_start_index:i + 1]
-      rendered_width = self._font.size(window)[0]
-      if rendered_width > self.size[0] - self._padding * 2:
-        truncated_line = self._text[line_start_index:i]
-        surface = self._render_line(truncated_line)
-        height = surface.get_size()[1]
-        if accumulated_height + height > height_limit:
-          break
-        self._line_surfaces.append(surface)
-        accumulated_height += height
-        line_start_index = i
-
-      # 3. Handle final line
-      if i == len(self._text) - 1:
-        final_line = self._text[line_start_index:i + 1]
-
-    if self._blinking_cursor and self._blinking_cursor.is_visible():
-      line_trailer = "_"
+    if self._is_layout_pending:
+      self._swap_in_finished_layout()
+    if self._blinking_cursor:
+      self._blinking_cursor.update(elapsed_time)
+
+  def time_until_update(self) -> Optional[int]:
+    if self._is_layout_pending:
+      return 0
+    if self._blinking_cursor:
+      return self._blinking_cursor.time_until_update()
+    return None
+
+  def _render_text(self, show_placeholder: bool = False):
+    if self._rect is None:
+      return
+    if self._batch_depth > 0:
+      self._is_render_deferred = True
+      return
+    if self._history is not None:
+      self._lines = self._visible_terminal_lines()
+      self._caret_location = (len(self._lines) - 1, len(self._lines[-1])) if self._scroll_offset == 0 else None
+    elif self._async_layout:
+      self._start_async_layout(show_placeholder)
+      return
     else:
-      line_trailer = ""
-    self._line_surfaces.append(self._render_line(final_line + line_trailer))
+      if len(self._wrap_cache) > TextArea.WRAP_CACHE_SIZE:
+        self._wrap_cache = {}
+      # Only the visible paragraphs are read from the buffer, and only the edited one isn't in the wrap cache
+      self._lines, self._caret_location = layout_paragraphs(self._font, self._buffer.get_paragraphs(),
+                                                            self._text_width(), self._max_lines(),
+                                                            self._buffer.get_caret(), self._wrap_cache, self._columns())
+    self._line_surfaces = self._render_cached_lines(self._lines)
+    self._notify_changed()
+
+  # Lines that were visible last time are not rendered again
+  def _render_cached_lines(self, lines: List[str]) -> List[Any]:
+    cache = {}
+    for line in lines:
+      if line not in cache:
+        cache[line] = self._line_surface_cache.get(line) or self._render_line(line)
+    self._line_surface_cache = cache
+    return [cache[line] for line in lines]
+
+  @contextmanager
+  def batch_edits(self):
+    self._batch_depth += 1
+    try:
+      yield self
+    finally:
+      self._batch_depth -= 1
+      if self._batch_depth == 0 and self._is_render_deferred:
+        self._is_render_deferred = False
+        self._render_text()
+
+  def _visible_terminal_lines(self) -> List[str]:
+    num_lines = self._max_lines() + 1
+    lines = [self._current_line] if self._scroll_offset == 0 else []
+    skip = max(self._scroll_offset - 1, 0)
+    lines += [line.rstrip('\n') for line in islice(reversed(self._history), skip, skip + num_lines - len(lines))]
+    lines.reverse()
+    return lines
+
+  def scroll_history(self, num_lines: int):
+    if self._history is None:
+      return
+    max_offset = max(len(self._history) - self._max_lines(), 0)
+    self._scroll_offset = max(0, min(self._scroll_offset + num_lines, max_offset))
+    self._render_text()
+
+  def handle_mouse_wheel(self, mouse_pos: Tuple[int, int], dy: int):
+    if self._history is not None and self._is_visible and self._rect.collidepoint(mouse_pos[0], mouse_pos[1]):
+      self.scroll_history(dy * TextArea.WHEEL_SCROLL_LINES)
+
+  def _append_to_terminal(self, text: str):
+    paragraphs = (self._current_line + text).split("\n")
+    num_new_lines = 0
+    for i, paragraph in enumerate(paragraphs):
+      if self._atlas:
+        lines = wrap_monospace_text(paragraph, self._columns())
+      else:
+        lines = wrap_text(self._font, paragraph, self._text_width())
+      if i < len(paragraphs) - 1:
+        lines[-1] += "\n"
+      else:
+        self._current_line = lines.pop()
+      self._history.extend(lines)
+      num_new_lines += len(lines)
+    if self._scroll_offset > 0:
+      # Keep the lines that the user scrolled back to in place, as long as they haven't been evicted
+      max_offset = max(len(self._history) - self._max_lines(), 0)
+      self._scroll_offset = min(self._scroll_offset + num_new_lines, max_offset)
+
+  def _backspace_in_terminal(self):
+    if self._current_line:
+      self._current_line = self._current_line[:-1]
+    elif self._history:
+      # Removes either the newline or, for a wrapped line, its last character
+      self._current_line = self._history.pop()[:-1]
+
+  def _start_async_layout(self, show_placeholder: bool):
+    self._layout_generation += 1
+    self._is_layout_pending = True
+    self._finished_layout = None
+    if show_placeholder or not self._line_surfaces:
+      self._lines = [TextArea.PLACEHOLDER_TEXT]
+      self._line_surfaces = [self._render_line(TextArea.PLACEHOLDER_TEXT)]
+      self._caret_location = None
+    _get_layout_executor().submit(self._layout_in_background, self._layout_generation, self._buffer.get_text(),
+                                  self._buffer.get_caret(), self._text_width(), self._max_lines(), self._columns())
+
+  # NOTE: Runs on the layout worker thread. pygame's font functions hold the GIL, so sharing the font with the UI
+  # thread is safe, but nothing here may touch the component's state other than publishing the finished layout.
+  def _layout_in_background(self, generation: int, text: str, caret: int, width: int, max_lines: int,
+      columns: Optional[int]):
+    lines, caret_location = layout_text(self._font, text, width, max_lines, caret, columns=columns)
+    surfaces = []
+    for line in lines:
+      if generation != self._layout_generation:
+        return
+      surfaces.append(self._render_line(line))
+      if len(surfaces) % TextArea.ASYNC_LINE_BATCH == 0 and len(surfaces) < len(lines):
+        # Publish the top lines early, so that the visible part of a large text shows up first
+        partial_caret_location = caret_location if caret_location and caret_location[0] < len(surfaces) else None
+        self._finished_layout = (generation, lines[:len(surfaces)], list(surfaces), partial_caret_location, False)
+    self._finished_layout = (generation, lines, surfaces, caret_location, True)
+
+  def _swap_in_finished_layout(self):
+    finished_layout = self._finished_layout
+    if finished_layout is None or finished_layout[0] != self._layout_generation:
+      return
+    _, self._lines, self._line_surfaces, self._caret_location, is_complete = finished_layout
+    self._is_layout_pending = not is_complete
+
+  def _text_width(self) -> int:
+    return self.size[0] - self._padding * 2
+
+  def _columns(self) -> Optional[int]:
+    if self._atlas:
+      return self._text_width() // self._atlas.cell_size[0]
+    return None
+
+  def _max_lines(self) -> int:
+    return (self._rect.h - self._padding * 2) // self._font.get_height()
 
   def _render_line(self, line: str):
-    return self._font.render(line, True, self._color)
+    with tracer.span("rasterize text", "text"):
+      if self._atlas:
+        return self._atlas.render_line(line)
+      return self._font.render(line, True, self._color)
 
   def _render_contents(self, surface):
     (x, y) = self._rect.topleft + Vector2(self._padding, self._padding)
     for line_surface in self._line_surfaces:
       surface.blit(line_surface, (x, y))
       y += line_surface.get_size()[1]
+    if self._blinking_cursor and self._blinking_cursor.is_visible() and self._caret_location:
+      self._render_cursor(surface)
+
+  def _render_cursor(self, surface):
+    if self._cursor_surface is None:
+      self._cursor_surface = self._render_line("_")
+    line_index, column = self._caret_location
+    if self._atlas:
+      x = self._rect.x + self._padding + column * self._atlas.cell_size[0]
+    else:
+      x = self._rect.x + self._padding + self._font.size(self._lines[line_index][:column])[0]
+    y = self._rect.y + self._padding + line_index * self._font.get_height()
+    surface.blit(self._cursor_surface, (x, y))
+
+  def get_text(self) -> str:
+    if self._history is not None:
+      return "".join(self._history) + self._current_line
+    return self._buffer.get_text()
 
   def append(self, text: str):
-    self._text += text
+    if self._history is not None:
+      self._append_to_terminal(text)
+    else:
+      caret = self._buffer.get_caret()
+      is_caret_at_end = caret == len(self._buffer)
+      self._buffer.move_caret(len(self._buffer))
+      self._buffer.insert(text)
+      if not is_caret_at_end:
+        self._buffer.move_caret(caret)
     self._render_text()
 
-  def backspace(self):
-    self._text = self._text[:-1]
+  def insert(self, text: str):
+    if self._history is not None:
+      self._append_to_terminal(text)
+    else:
+      self._buffer.insert(text)
     self._render_text()
 
-  def set_text(self, text: str):
-    self._text = text
+  def backspace(self, num_chars: int = 1):
+    if self._history is not None:
+      for _ in range(num_chars):
+        self._backspace_in_terminal()
+    else:
+      self._buffer.delete_backward(num_chars)
     self._render_text()
+
+  def delete(self):
+    if self._history is None:
+      self._buffer.delete_forward()
+      self._render_text()
+
+  def move_caret(self, delta: int):
+    if self._history is None:
+      self._buffer.move_caret(self._buffer.get_caret() + delta)
+      self._render_text()
+
+  def set_caret(self, index: int):
+    if self._history is None:
+      self._buffer.move_caret(index)
+      self._render_text()
+
+  def set_text(self, text: str):
+    if self._history is not None:
+      self._history.clear()
+      self._scroll_offset = 0
+      self._current_line = ""
+      self._append_to_terminal(text)
+    else:
+      self._buffer.set_text(text)
+    self._render_text(show_placeholder=True)
+
+
+_layout_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_layout_executor() -> ThreadPoolExecutor:
+  global _layout_executor
+  if _layout_executor is None:
+    _layout_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="text-layout")
+  return _layout_executor
+
+
+# Splits the text into lines that are at most max_width pixels wide. At most max_lines complete lines are returned,
+# followed by the final (unterminated) line, which is empty if the text didn't fit.
+def wrap_text(font: Font, text: str, max_width: int, max_lines: Optional[int] = None) -> List[str]:
+  lines = []
+  line_start_index = 0
+
+  for i in range(len(text)):
+
+    # 1. Handle newline char
+    if text[i] == '\n':
+      if max_lines is not None and len(lines) == max_lines:
+        return lines + [""]
+      lines.append(text[line_start_index:i])
+      line_start_index = i + 1
+
+    # 2. Break line if it exceeds max length
+    window = text[line_start_index:i + 1]
+    if font.size(window)[0] > max_width:
+      if max_lines is not None and len(lines) == max_lines:
+        return lines + [""]
+      lines.append(text[line_start_index:i])
+      line_start_index = i
+
+  # 3. Handle final line
+  lines.append(text[line_start_index:])
+  return lines
+
+
+# Lays out the text like wrap_text(), but paragraph by paragraph. Wrapped paragraphs are looked up in and added to
+# wrap_cache, so that after an edit only the edited paragraph needs to be wrapped again. Also returns the line and
+# column of the caret, or None if it's not among the returned lines.
+# If columns is given, the font is assumed to be monospace and lines are wrapped after that many characters.
+def layout_text(font: Font, text: str, max_width: int, max_lines: Optional[int], caret: int,
+    wrap_cache: Optional[Dict[str, List[str]]] = None,
+    columns: Optional[int] = None) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+  return layout_paragraphs(font, text.split("\n"), max_width, max_lines, caret, wrap_cache, columns)
+
+
+# Like layout_text(), for text that is already split into paragraphs. The paragraphs after the last one that fits are
+# never accessed, so they can be read lazily (see GapBuffer.get_paragraphs()).
+def layout_paragraphs(font: Font, paragraphs: Sequence[str], max_width: int, max_lines: Optional[int], caret: int,
+    wrap_cache: Optional[Dict[str, List[str]]] = None,
+    columns: Optional[int] = None) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+  lines = []
+  caret_location = None
+  paragraph_start = 0
+  last = len(paragraphs) - 1
+  for i, paragraph in enumerate(paragraphs):
+    wrapped = wrap_cache.get(paragraph) if wrap_cache is not None else None
+    is_wrapped_completely = True
+    if wrapped is None:
+      # Only the lines that still fit are wrapped, which matters for long paragraphs
+      remaining_lines = max_lines - len(lines) if max_lines is not None else None
+      if columns:
+        wrapped = wrap_monospace_text(paragraph, columns, remaining_lines)
+      else:
+        wrapped = wrap_text(font, paragraph, max_width, remaining_lines)
+      # A paragraph that was cut off ends with an empty line, which a non-empty paragraph can't otherwise do
+      is_wrapped_completely = remaining_lines is None or len(wrapped) <= remaining_lines or wrapped[-1] != "" \
+                              or paragraph == ""
+      if wrap_cache is not None and is_wrapped_completely:
+        wrap_cache[paragraph] = wrapped
+    if caret_location is None and caret <= paragraph_start + len(paragraph):
+      caret_location = _locate_caret(wrapped, caret - paragraph_start, len(lines))
+    is_last = i == last and is_wrapped_completely
+    num_complete_lines = len(wrapped) - 1 if is_last else len(wrapped)
+    if max_lines is not None and len(lines) + num_complete_lines > max_lines:
+      lines += wrapped[:max_lines - len(lines)]
+      if caret_location and caret_location[0] >= max_lines:
+        caret_location = None
+      return lines + [""], caret_location
+    lines += wrapped
+    paragraph_start += len(paragraph) + 1
+  return lines, caret_location
+
+
+def _locate_caret(wrapped_paragraph: List[str], column: int, first_line_index: int) -> Tuple[int, int]:
+  for i, line in enumerate(wrapped_paragraph):
+    if column < len(line) or i == len(wrapped_paragraph) - 1:
+      return first_line_index + i, column
+    column -= len(line)
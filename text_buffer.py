@@ -0,0 +1,138 @@
+from collections.abc import Sequence
+from typing import List, Optional
+
+
+# A gap buffer keeps the unused capacity of the text at the caret, so that inserting and deleting there doesn't
+# copy the rest of the text. Moving the caret costs time proportional to the distance moved.
+# The positions of the newlines are kept as well, so that single paragraphs can be read without joining the whole
+# text. The newlines after the gap are counted from the end of the text, so that edits at the gap don't move them.
+class GapBuffer:
+  GAP_SIZE = 64
+
+  def __init__(self, text: str = ""):
+    self._chars: List[str] = []
+    self._gap_start = 0
+    self._gap_end = 0
+    self._text: Optional[str] = None
+    # Indices of the newlines before the gap, ascending
+    self._newlines_before: List[int] = []
+    # Distances of the newlines after the gap from the end of the text, ascending (so the one nearest the gap is last)
+    self._newlines_after: List[int] = []
+    self.set_text(text)
+
+  def __len__(self) -> int:
+    return len(self._chars) - (self._gap_end - self._gap_start)
+
+  def get_caret(self) -> int:
+    return self._gap_start
+
+  def move_caret(self, index: int):
+    index = max(0, min(index, len(self)))
+    if index < self._gap_start:
+      length = len(self)
+      while self._newlines_before and self._newlines_before[-1] >= index:
+        self._newlines_after.append(length - self._newlines_before.pop())
+      num_moved = self._gap_start - index
+      self._chars[self._gap_end - num_moved:self._gap_end] = self._chars[index:self._gap_start]
+      self._gap_start = index
+      self._gap_end -= num_moved
+    elif index > self._gap_start:
+      length = len(self)
+      while self._newlines_after and length - self._newlines_after[-1] < index:
+        self._newlines_before.append(length - self._newlines_after.pop())
+      num_moved = index - self._gap_start
+      self._chars[self._gap_start:index] = self._chars[self._gap_end:self._gap_end + num_moved]
+      self._gap_start = index
+      self._gap_end += num_moved
+
+  def insert(self, text: str):
+    if len(text) > self._gap_end - self._gap_start:
+      self._grow(len(text))
+    self._newlines_before += _find_newlines(text, self._gap_start)
+    self._chars[self._gap_start:self._gap_start + len(text)] = text
+    self._gap_start += len(text)
+    self._text = None
+
+  def delete_backward(self, num_chars: int = 1):
+    self._gap_start = max(self._gap_start - num_chars, 0)
+    while self._newlines_before and self._newlines_before[-1] >= self._gap_start:
+      self._newlines_before.pop()
+    self._text = None
+
+  def delete_forward(self, num_chars: int = 1):
+    end = min(self._gap_start + num_chars, len(self))
+    length = len(self)
+    while self._newlines_after and length - self._newlines_after[-1] < end:
+      self._newlines_after.pop()
+    self._gap_end += end - self._gap_start
+    self._text = None
+
+  def set_text(self, text: str):
+    self._chars = list(text) + [""] * GapBuffer.GAP_SIZE
+    self._gap_start = len(text)
+    self._gap_end = len(self._chars)
+    self._text = text
+    self._newlines_before = _find_newlines(text, 0)
+    self._newlines_after = []
+
+  def get_text(self) -> str:
+    if self._text is None:
+      self._text = "".join(self._chars[:self._gap_start]) + "".join(self._chars[self._gap_end:])
+    return self._text
+
+  # The text is made of paragraphs separated by newlines. An empty text has one empty paragraph.
+  def get_num_paragraphs(self) -> int:
+    return len(self._newlines_before) + len(self._newlines_after) + 1
+
+  def get_paragraph(self, paragraph_index: int) -> str:
+    start = self.get_paragraph_start(paragraph_index)
+    end = self._newline_index(paragraph_index) if paragraph_index < self.get_num_paragraphs() - 1 else len(self)
+    return self._slice(start, end)
+
+  def get_paragraph_start(self, paragraph_index: int) -> int:
+    return self._newline_index(paragraph_index - 1) + 1 if paragraph_index > 0 else 0
+
+  # The paragraphs as a sequence that reads each paragraph from the buffer when it's accessed
+  def get_paragraphs(self) -> 'Paragraphs':
+    return Paragraphs(self)
+
+  def _newline_index(self, newline_number: int) -> int:
+    num_before = len(self._newlines_before)
+    if newline_number < num_before:
+      return self._newlines_before[newline_number]
+    return len(self) - self._newlines_after[len(self._newlines_after) - 1 - (newline_number - num_before)]
+
+  def _slice(self, start: int, end: int) -> str:
+    gap_length = self._gap_end - self._gap_start
+    if end <= self._gap_start:
+      return "".join(self._chars[start:end])
+    if start >= self._gap_start:
+      return "".join(self._chars[start + gap_length:end + gap_length])
+    return "".join(self._chars[start:self._gap_start]) + "".join(self._chars[self._gap_end:end + gap_length])
+
+  def _grow(self, min_gap_size: int):
+    extra = max(min_gap_size, len(self._chars))
+    self._chars[self._gap_end:self._gap_end] = [""] * extra
+    self._gap_end += extra
+
+
+def _find_newlines(text: str, offset: int) -> List[int]:
+  newlines = []
+  newline = text.find("\n")
+  while newline != -1:
+    newlines.append(offset + newline)
+    newline = text.find("\n", newline + 1)
+  return newlines
+
+
+class Paragraphs(Sequence):
+  def __init__(self, buffer: GapBuffer):
+    self._buffer = buffer
+
+  def __len__(self) -> int:
+    return self._buffer.get_num_paragraphs()
+
+  def __getitem__(self, index: int) -> str:
+    if not 0 <= index < len(self):
+      raise IndexError(index)
+    return self._buffer.get_paragraph(index)
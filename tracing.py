@@ -0,0 +1,117 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Deque, Callable
+
+
+# Records spans of work (frames, event dispatch, updates, layout, rendering) and writes them in the Chrome trace event
+# format, which trace viewers such as Perfetto and chrome://tracing can open. Tracing is off until start() is called.
+# Only the most recent spans are kept, so a tracer can be left running and written out after a spike has been seen.
+class Tracer:
+  # Spans kept in memory. Older ones are dropped.
+  MAX_EVENTS = 200_000
+
+  def __init__(self):
+    self._is_enabled = False
+    self._events: Deque[Dict[str, Any]] = deque(maxlen=Tracer.MAX_EVENTS)
+    self._thread_names: Dict[int, str] = {}
+    self._start = time.perf_counter()
+
+  def start(self, max_events: int = MAX_EVENTS):
+    if self._events.maxlen != max_events:
+      self._events = deque(self._events, maxlen=max_events)
+    self._is_enabled = True
+
+  def stop(self):
+    self._is_enabled = False
+
+  def is_enabled(self) -> bool:
+    return self._is_enabled
+
+  def clear(self):
+    self._events.clear()
+
+  # Used as a context manager around the work. When tracing is off this costs one method call.
+  def span(self, name: str, category: str, args: Optional[Dict[str, Any]] = None):
+    if not self._is_enabled:
+      return _NO_SPAN
+    return _Span(self, name, category, args)
+
+  def instant(self, name: str, category: str):
+    if self._is_enabled:
+      self._events.append({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._now(),
+                           "tid": self._thread_id()})
+
+  def write(self, file_path: str):
+    pid = os.getpid()
+    events = [dict(event, pid=pid) for event in list(self._events)]
+    events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+               for tid, name in self._thread_names.items()]
+    with open(file_path, "w") as f:
+      json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+  # Microseconds since the tracer was created
+  def _now(self) -> float:
+    return (time.perf_counter() - self._start) * 1_000_000
+
+  def _thread_id(self) -> int:
+    tid = threading.get_ident()
+    if tid not in self._thread_names:
+      self._thread_names[tid] = threading.current_thread().name
+    return tid
+
+  def _add_span(self, name: str, category: str, args: Optional[Dict[str, Any]], start: float):
+    event = {"name": name, "cat": category, "ph": "X", "ts": start, "dur": self._now() - start,
+             "tid": self._thread_id()}
+    if args:
+      event["args"] = args
+    self._events.append(event)
+
+
+class _Span:
+  __slots__ = ("_tracer", "_name", "_category", "_args", "_start")
+
+  def __init__(self, tracer: Tracer, name: str, category: str, args: Optional[Dict[str, Any]]):
+    self._tracer = tracer
+    self._name = name
+    self._category = category
+    self._args = args
+
+  def __enter__(self):
+    self._start = self._tracer._now()
+    return self
+
+  def __exit__(self, *exc_info):
+    self._tracer._add_span(self._name, self._category, self._args, self._start)
+    return False
+
+
+class _NoSpan:
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    return False
+
+
+_NO_SPAN = _NoSpan()
+
+tracer = Tracer()
+
+
+# Decorates a method so that each call is recorded as a span named after the class of the object and the method
+def traced(category: str) -> Callable:
+  def decorator(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+      if not tracer._is_enabled:
+        return method(self, *args, **kwargs)
+      with _Span(tracer, "%s.%s" % (type(self).__name__, method.__name__), category, None):
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+  return decorator
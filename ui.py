@@ -1,10 +1,43 @@
-from typing import Tuple, Optional, Any
+import math
+from typing import Tuple, Optional, Any, List, Callable
 
-import pygame
 from pygame.color import Color
 from pygame.math import Vector2
 from pygame.rect import Rect
 
+from latency import note_change
+from render_backend import draw_rect, draw_line
+from tracing import tracer
+
+_is_occlusion_culling_enabled = True
+
+
+# With occlusion culling, whatever opaque components cover isn't drawn. Without it everything is drawn back to front,
+# which is slower but handy for checking that culling doesn't change what ends up on screen.
+def set_occlusion_culling(enabled: bool):
+  global _is_occlusion_culling_enabled
+  _is_occlusion_culling_enabled = enabled
+
+
+def is_occlusion_culling_enabled() -> bool:
+  return _is_occlusion_culling_enabled
+
+
+_after_update_callbacks: List[Callable[[], Any]] = []
+
+
+# Calls the callback once the application has run all of this frame's updates (or handled the current input event),
+# before the frame is rendered. Lets components combine what happened over several fixed timesteps.
+def call_after_updates(callback: Callable[[], Any]):
+  _after_update_callbacks.append(callback)
+
+
+def run_after_update_callbacks():
+  callbacks = list(_after_update_callbacks)
+  _after_update_callbacks.clear()
+  for callback in callbacks:
+    callback()
+
 
 class BackgroundGrid:
   def __init__(self, screen_resolution, line_color: Color, cell_width):
@@ -12,11 +45,15 @@ class BackgroundGrid:
     self._line_color = line_color
     self._cell_width = cell_width
 
+  # Only the lines that cross the surface's clip rect are drawn
   def render(self, surface):
-    for x in range(0, self._screen_resolution[0], self._cell_width):
-      pygame.draw.line(surface, self._line_color, (x, 0), (x, self._screen_resolution[1]))
-    for y in range(0, self._screen_resolution[1], self._cell_width):
-      pygame.draw.line(surface, self._line_color, (0, y), (self._screen_resolution[0], y))
+    clip = surface.get_clip()
+    first_x = -(-clip.left // self._cell_width) * self._cell_width
+    for x in range(first_x, min(clip.right, self._screen_resolution[0]), self._cell_width):
+      draw_line(surface, self._line_color, (x, 0), (x, self._screen_resolution[1]))
+    first_y = -(-clip.top // self._cell_width) * self._cell_width
+    for y in range(first_y, min(clip.bottom, self._screen_resolution[1]), self._cell_width):
+      draw_line(surface, self._line_color, (0, y), (self._screen_resolution[0], y))
 
 
 class Style:
@@ -41,17 +78,30 @@ class Component:
     self._is_hovered = False
     self._active_style: Style = self._style
     self._is_visible = True
+    # The container or component that renders this one, which is told when this one changes
+    self._parent: Optional['Component'] = None
 
   def update(self, elapsed_time: int):
     pass
 
+  # Milliseconds until update() is expected to change the component's state. 0 means that it's animating and needs
+  # to be updated every frame, while None means that only user input can change it.
+  def time_until_update(self) -> Optional[int]:
+    return None
+
+  # Positions are rounded down, rather than truncated towards zero like Rect does, so that moving a component by whole
+  # pixels moves every pixel of it the same, also at negative coordinates
   def set_pos(self, pos: Vector2):
-    self._rect = Rect(pos, self.size)
+    self._rect = Rect(math.floor(pos[0]), math.floor(pos[1]), self.size[0], self.size[1])
 
   # TODO Have stricter control over size variable - make it private and always set it with this method?
+  # Reported before and after the change, so that both the area that the component covered until now and the one it
+  # covers from now on are repainted
   def set_size(self, size: Tuple[int, int]):
+    self._notify_changed()
     self.size = size
     self._rect.size = size
+    self._notify_changed()
 
   def handle_key_was_pressed(self, key):
     pass
@@ -67,9 +117,14 @@ class Component:
   def handle_mouse_was_released(self):
     pass
 
+  def handle_mouse_wheel(self, mouse_pos: Tuple[int, int], dy: int):
+    pass
+
   def handle_mouse_motion(self, mouse_pos: Tuple[int, int]):
     self._assert_initialized()
-    hover = self._rect.collidepoint(mouse_pos[0], mouse_pos[1])
+    self.set_hovered(self._rect.collidepoint(mouse_pos[0], mouse_pos[1]), mouse_pos)
+
+  def set_hovered(self, hover: bool, mouse_pos: Tuple[int, int]):
     if self._is_hovered and not hover:
       self._active_style = self._style
       self._on_blur()
@@ -79,24 +134,76 @@ class Component:
       self._on_hover(mouse_pos)
     self._is_hovered = hover
 
+  # Appends the chain of components under the mouse, starting with this one, along with the mouse position in each
+  # component's coordinate system
+  def find_hover_path(self, mouse_pos: Tuple[int, int], path: List[Tuple['Component', Tuple[int, int]]]):
+    self._assert_initialized()
+    if self._is_visible and self._rect.collidepoint(mouse_pos[0], mouse_pos[1]):
+      path.append((self, mouse_pos))
+
   def render(self, surface):
     self._assert_initialized()
     if self._is_visible:
-      if self._active_style:
-        if self._active_style.background_color:
-          pygame.draw.rect(surface, self._active_style.background_color, self._rect)
-        elif self._active_style.background_surface:
-          surface.blit(self._active_style.background_surface, self._rect)
-      self._render_contents(surface)
-      if self._active_style and self._active_style.border_color:
-        pygame.draw.rect(surface, self._active_style.border_color, self._rect, self._active_style.border_width)
+      with tracer.span(type(self).__name__, "render"):
+        if self._active_style:
+          self._render_background(surface)
+        self._render_contents(surface)
+        if self._active_style and self._active_style.border_color:
+          draw_rect(surface, self._active_style.border_color, self._rect, self._active_style.border_width)
 
   def set_visible(self, visible: bool):
-    self._is_visible = visible
+    if visible != self._is_visible:
+      self._is_visible = visible
+      self._notify_changed()
 
   def is_visible(self) -> bool:
     return self._is_visible
 
+  def get_rect(self) -> Rect:
+    self._assert_initialized()
+    return Rect(self._rect)
+
+  # The area that render() covers with opaque pixels, hiding whatever was drawn there before. Components whose contents
+  # are opaque can override this.
+  def get_opaque_rect(self) -> Optional[Rect]:
+    if self._is_visible and self._active_style and self._active_style.background_color \
+        and Color(self._active_style.background_color).a == 255:
+      return Rect(self._rect)
+    return None
+
+  # Appends the opaque areas of this component and the components inside it
+  def collect_occluders(self, occluders: List[Rect]):
+    if not _is_occlusion_culling_enabled:
+      return
+    rect = self.get_opaque_rect()
+    if rect is not None:
+      occluders.append(rect)
+
+  # Called when the component changes what it shows other than through input or update(), for example from another
+  # component's callback. Parents that keep rendered pixels (like ScrollContainer) use this to repaint them.
+  def _notify_changed(self):
+    note_change()
+    if self._parent is not None:
+      self._parent._child_changed(self)
+
+  def _child_changed(self, child: 'Component'):
+    if self._parent is not None:
+      self._parent._child_changed(self)
+
+  # For components that render other components themselves, such as a button's label
+  def _adopt(self, child: 'Component') -> 'Component':
+    child._parent = self
+    return child
+
+  def _render_background(self, surface):
+    self._render_background_area(surface, self._rect)
+
+  def _render_background_area(self, surface, area: Rect):
+    if self._active_style.background_color:
+      draw_rect(surface, self._active_style.background_color, area)
+    elif self._active_style.background_surface:
+      surface.blit(self._active_style.background_surface, area, area.move(-self._rect.x, -self._rect.y))
+
   def _render_contents(self, surface):
     pass
 
@@ -114,3 +221,50 @@ class Component:
   def _assert_initialized(self):
     if self._rect is None:
       raise Exception("You must set the position of this component before interacting with it: %s" % self)
+
+
+# Keeps track of the chain of components under the mouse, so that on mouse motion only the components that the mouse
+# left or entered are notified, rather than every component in the tree.
+class HoverTracker:
+  def __init__(self, root: Component):
+    self._root = root
+    self._path: List[Component] = []
+
+  def handle_mouse_motion(self, mouse_pos: Tuple[int, int]):
+    path: List[Tuple[Component, Tuple[int, int]]] = []
+    self._root.find_hover_path(mouse_pos, path)
+    new_components = [component for component, _ in path]
+    for component in self._path:
+      if component not in new_components:
+        component.set_hovered(False, mouse_pos)
+    for component, local_mouse_pos in path:
+      if component not in self._path:
+        component.set_hovered(True, local_mouse_pos)
+    self._path = new_components
+
+
+# The parts of the rect that aren't covered by any of the occluders, as non-overlapping rects
+def subtract_rects(rect: Rect, occluders: List[Rect]) -> List[Rect]:
+  pieces = [Rect(rect)]
+  for occluder in occluders:
+    hits = occluder.collidelistall(pieces)
+    if not hits:
+      continue
+    hit_set = set(hits)
+    remaining = [piece for i, piece in enumerate(pieces) if i not in hit_set]
+    for i in hits:
+      piece = pieces[i]
+      overlap = piece.clip(occluder)
+      # The bands above and below the overlap span the whole piece, the ones beside it only the overlap's height
+      if overlap.top > piece.top:
+        remaining.append(Rect(piece.left, piece.top, piece.width, overlap.top - piece.top))
+      if overlap.bottom < piece.bottom:
+        remaining.append(Rect(piece.left, overlap.bottom, piece.width, piece.bottom - overlap.bottom))
+      if overlap.left > piece.left:
+        remaining.append(Rect(piece.left, overlap.top, overlap.left - piece.left, overlap.height))
+      if overlap.right < piece.right:
+        remaining.append(Rect(overlap.right, overlap.top, piece.right - overlap.right, overlap.height))
+    pieces = remaining
+    if not pieces:
+      break
+  return pieces
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, Any, Callable, Optional, List, Tuple
+
+import pygame
+from pygame import Rect
+from pygame.color import Color
+from pygame.font import Font
+from pygame.math import Vector2
+
+from button import button, HoldDownBehavior
+from checkbox import checkbox
+from containers import AbsolutePosContainer, ListContainer, Orientation, EvenSpacingContainer, ScrollContainer, \
+  GridContainer
+from fonts import get_font, warm_fonts
+from images import image_surface
+from text import StaticText, TextArea, BlinkingCursor
+from ui import Component, Style
+
+# The modules whose code decides how components are measured and laid out. A cached layout is only used if none of
+# them has changed since it was written.
+LAYOUT_MODULES = ["button", "checkbox", "containers", "fonts", "images", "text", "ui"]
+
+
+# Builds component trees from a declarative description in JSON or TOML:
+#
+#   {
+#     "fonts": {"default": {"path": "resources/consola.ttf", "size": 14}},
+#     "root": {"type": "AbsolutePosContainer", "children": [
+#       {"type": "button", "pos": [5, 5], "font": "default", "size": [200, 32], "label": "Hi", "action": "greet"}
+#     ]}
+#   }
+#
+# Callbacks are referred to by name and looked up in the given actions. Components that have an "id" can be fetched
+# with get_component() after loading, also from custom factories for later nodes.
+#
+# If a layout cache directory is given, the rects (position and size) that the components ended up with are stored
+# there, keyed by a hash of the spec, the font files, the screen resolution, pygame's version and the layout code. Any
+# change to one of those gives a different key. On subsequent loads the cached sizes replace "fit_contents" and
+# "fill_parent", so containers don't have to measure their children. After the tree has been positioned its rects are
+# compared with the cached ones, and the cache is rewritten if they differ.
+class UiSpecLoader:
+  def __init__(self, actions: Optional[Dict[str, Callable]] = None,
+      factories: Optional[Dict[str, Callable[['UiSpecLoader', Dict[str, Any]], Component]]] = None,
+      layout_cache_dir: Optional[str] = None):
+    self._actions = actions or {}
+    self._factories = dict(DEFAULT_FACTORIES)
+    self._factories.update(factories or {})
+    self._layout_cache_dir = layout_cache_dir
+    self._font_specs: Dict[str, Dict[str, Any]] = {}
+    self._components_by_id: Dict[str, Component] = {}
+    self._built_nodes: List[Tuple[Dict[str, Any], Component]] = []
+    self._cached_rects: Optional[List[List[int]]] = None
+    self.resolution: Tuple[int, int] = (0, 0)
+
+  def load(self, file_path: str, resolution: Tuple[int, int]) -> Component:
+    if file_path.endswith(".toml"):
+      # Imported here, as tomllib needs Python 3.11
+      import tomllib
+      with open(file_path, "rb") as f:
+        spec = tomllib.load(f)
+    else:
+      with open(file_path, "r") as f:
+        spec = json.load(f)
+    return self.build(spec, resolution)
+
+  def build(self, spec: Dict[str, Any], resolution: Tuple[int, int]) -> Component:
+    self.resolution = resolution
+    self._font_specs = spec.get("fonts", {})
+    # Parse the fonts while the first components are built, they are shared with anything else that uses them
+    warm_fonts([_font_args(font_spec) for font_spec in self._font_specs.values()])
+    self._components_by_id = {}
+    self._built_nodes = []
+    cache_path = self._layout_cache_path(spec, resolution)
+    self._cached_rects = _read_cached_rects(cache_path)
+
+    root = self.build_node(spec["root"])
+    root.set_pos(Vector2(0, 0))
+
+    if cache_path is not None:
+      rects = [_rect_list(component.get_rect()) for _, component in self._built_nodes]
+      if rects != self._cached_rects:
+        _write_cached_rects(cache_path, rects)
+    return root
+
+  def build_node(self, node: Dict[str, Any]) -> Component:
+    # Reserve this node's place in depth first order before its children are built
+    index = len(self._built_nodes)
+    self._built_nodes.append((node, None))
+    if self._cached_rects is not None and index < len(self._cached_rects):
+      node = dict(node, cached_size=self._cached_rects[index][2:])
+    component = self._factories[node["type"]](self, node)
+    self._built_nodes[index] = (node, component)
+    if "id" in node:
+      self._components_by_id[node["id"]] = component
+    return component
+
+  def build_children(self, node: Dict[str, Any]) -> List[Component]:
+    return [self.build_node(child) for child in node.get("children", [])]
+
+  def get_component(self, component_id: str) -> Component:
+    return self._components_by_id[component_id]
+
+  def get_font(self, name: str) -> Font:
+    return get_font(*_font_args(self._font_specs[name]))
+
+  def get_action(self, name: Optional[str]) -> Optional[Callable]:
+    return self._actions[name] if name is not None else None
+
+  def _layout_cache_path(self, spec: Dict[str, Any], resolution: Tuple[int, int]) -> Optional[str]:
+    if self._layout_cache_dir is None:
+      return None
+    font_files = sorted({font_spec["path"] for font_spec in spec.get("fonts", {}).values()})
+    key = json.dumps({
+      "spec": spec,
+      "resolution": list(resolution),
+      "font_files": [(path, os.path.getmtime(path)) for path in font_files],
+      "pygame": pygame.version.ver,
+      "layout_code": [(name, os.path.getmtime(sys.modules[name].__file__)) for name in LAYOUT_MODULES],
+    }, sort_keys=True)
+    return os.path.join(self._layout_cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _font_args(font_spec: Dict[str, Any]) -> Tuple[str, int, bool, bool]:
+  return font_spec["path"], font_spec["size"], font_spec.get("bold", False), font_spec.get("italic", False)
+
+
+def _rect_list(rect: Rect) -> List[int]:
+  return [rect.x, rect.y, rect.w, rect.h]
+
+
+def _read_cached_rects(cache_path: Optional[str]) -> Optional[List[List[int]]]:
+  if cache_path is None or not os.path.exists(cache_path):
+    return None
+  try:
+    with open(cache_path, "r") as f:
+      return json.load(f)["rects"]
+  except (OSError, ValueError, KeyError):
+    return None
+
+
+def _write_cached_rects(cache_path: str, rects: List[List[int]]):
+  os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+  with open(cache_path, "w") as f:
+    json.dump({"rects": rects}, f)
+
+
+# The size from the layout cache if there is one, otherwise the size given in the spec
+def node_size(node: Dict[str, Any], key: str = "size") -> Tuple[Any, Any]:
+  if "cached_size" in node:
+    return tuple(node["cached_size"])
+  return tuple(node[key])
+
+
+def node_style(node: Dict[str, Any], key: str = "style") -> Optional[Style]:
+  style = node.get(key)
+  if style is None:
+    return None
+  return Style(background_color=_color(style.get("background_color")),
+               border_color=_color(style.get("border_color")),
+               border_width=style.get("border_width", 1))
+
+
+def _color(value: Optional[List[int]]) -> Optional[Color]:
+  return Color(*value) if value is not None else None
+
+
+def _hotkey(node: Dict[str, Any]) -> Optional[int]:
+  return pygame.key.key_code(node["hotkey"]) if "hotkey" in node else None
+
+
+def _build_absolute_pos_container(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  size = node_size(node) if "size" in node or "cached_size" in node else loader.resolution
+  positioned_children = [(Vector2(child["pos"]), loader.build_node(child)) for child in node.get("children", [])]
+  return AbsolutePosContainer(size, positioned_children)
+
+
+def _build_list_container(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  (width, height) = node_size(node) if "cached_size" in node else (node["width"], node["height"])
+  orientation = Orientation.HORIZONTAL if node["orientation"] == "horizontal" else Orientation.VERTICAL
+  return ListContainer(width=width, height=height, children=loader.build_children(node),
+                       margin=node["margin"], padding=node["padding"], orientation=orientation,
+                       style=node_style(node), layout_store=node.get("layout_store", False))
+
+
+def _build_even_spacing_container(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  (width, height) = node_size(node) if "cached_size" in node else (node["width"], node["height"])
+  return EvenSpacingContainer(width, height, loader.build_children(node), padding=node["padding"],
+                              style=node_style(node))
+
+
+def _build_scroll_container(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  return ScrollContainer(height=node["height"], children=loader.build_children(node), padding=node["padding"],
+                         margin=node["margin"], style=node_style(node))
+
+
+def _build_grid_container(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  return GridContainer(children=loader.build_children(node), dimensions=tuple(node["dimensions"]),
+                       padding=node["padding"], margin=node["margin"], style=node_style(node),
+                       layout_store=node.get("layout_store", False))
+
+
+def _build_static_text(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  return StaticText(loader.get_font(node["font"]), _color(node.get("color", [255, 255, 255])), node["text"],
+                    style=node_style(node))
+
+
+def _build_text_area(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  blinking_cursor = BlinkingCursor(node["blinking_cursor"]) if "blinking_cursor" in node else None
+  return TextArea(loader.get_font(node["font"]), _color(node.get("color", [255, 255, 255])), node_size(node),
+                  padding=node["padding"], blinking_cursor=blinking_cursor,
+                  async_layout=node.get("async_layout", False), scrollback=node.get("scrollback"),
+                  style=node_style(node))
+
+
+def _build_button(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  hold = HoldDownBehavior(*node["hold"]) if "hold" in node else None
+  return button(loader.get_font(node["font"]), node_size(node), callback=loader.get_action(node.get("action")),
+                label=node["label"], hotkey=_hotkey(node), hold=hold,
+                batch_callback=loader.get_action(node.get("batch_action")))
+
+
+def _build_checkbox(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  return checkbox(loader.get_font(node["font"]), node_size(node), callback=loader.get_action(node.get("action")),
+                  label=node["label"], checked=node.get("checked", False))
+
+
+def _build_image(loader: UiSpecLoader, node: Dict[str, Any]) -> Component:
+  return image_surface(node["path"], node_size(node))
+
+
+DEFAULT_FACTORIES: Dict[str, Callable[[UiSpecLoader, Dict[str, Any]], Component]] = {
+  "AbsolutePosContainer": _build_absolute_pos_container,
+  "ListContainer": _build_list_container,
+  "EvenSpacingContainer": _build_even_spacing_container,
+  "ScrollContainer": _build_scroll_container,
+  "GridContainer": _build_grid_container,
+  "StaticText": _build_static_text,
+  "TextArea": _build_text_area,
+  "button": _build_button,
+  "checkbox": _build_checkbox,
+  "image": _build_image,
+}